@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", 5000))
+# Entries kept per document set and conversation; bounds the similarity scan done on every lookup.
+ANSWER_CACHE_MAX_PER_DOCUMENT_SET = int(os.environ.get("ANSWER_CACHE_MAX_PER_DOCUMENT_SET", 256))
+# Minimum cosine similarity between question embeddings for a cached answer to be reused.
+ANSWER_CACHE_SIMILARITY = float(os.environ.get("ANSWER_CACHE_SIMILARITY", 0.95))
+ANSWER_CACHE_TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", 86400))
+
+
+class AnswerCache:
+    """
+    Bounded semantic cache of /ask/ answers. Entries are grouped by the set of documents
+    the question was answered from and by the conversation it was asked in, so opening
+    questions over the same (deduplicated) course material share answers across sessions,
+    while a follow-up only matches an identical conversation and never another user's.
+    A session whose documents change simply stops matching its old group. An answer is
+    reused only when a new question is within the similarity threshold of a cached one
+    and retrieval returned the same chunks.
+    """
+
+    def __init__(self, max_entries, max_per_document_set, similarity, ttl_seconds):
+        self.max_entries = max_entries
+        self.max_per_document_set = max_per_document_set
+        self.similarity = similarity
+        self.ttl_seconds = ttl_seconds
+
+        # (document_key, conversation_key) -> OrderedDict(entry_id -> (question_vector, chunk_ids, answer, stored_at))
+        self._groups = {}
+        # (group_key, entry_id) in least-recently-used order, across all groups.
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def document_key(document_ids):
+        return tuple(sorted(set(document_ids)))
+
+    @staticmethod
+    def conversation_key(summary, history):
+        """Digest of the running summary and recent messages; empty for a conversation's first question."""
+        if not summary and not history:
+            return ""
+        payload = json.dumps([summary or "", list(history or [])], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _group_key(self, document_ids, summary, history):
+        return self.document_key(document_ids), self.conversation_key(summary, history)
+
+    def _remove_locked(self, group_key, entry_id):
+        group = self._groups.get(group_key)
+        if group is not None:
+            group.pop(entry_id, None)
+            if not group:
+                del self._groups[group_key]
+        self._lru.pop((group_key, entry_id), None)
+
+    def get(self, document_ids, question_vector, chunk_ids, summary="", history=()):
+        """
+        Returns a cached answer for an equivalent question over the same chunks, asked
+        with the same chat summary and history, or None.
+        """
+        group_key = self._group_key(document_ids, summary, history)
+        chunk_key = frozenset(chunk_ids)
+        now = time.monotonic()
+
+        with self._lock:
+            group = self._groups.get(group_key)
+            best_id, best_score, best_answer = None, self.similarity, None
+
+            if group:
+                for entry_id, (vector, entry_chunks, answer, stored_at) in list(group.items()):
+                    if self.ttl_seconds and now - stored_at > self.ttl_seconds:
+                        self._remove_locked(group_key, entry_id)
+                        continue
+                    if entry_chunks != chunk_key:
+                        continue
+                    score = float(np.dot(vector, question_vector))
+                    if score >= best_score:
+                        best_id, best_score, best_answer = entry_id, score, answer
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._lru.move_to_end((group_key, best_id))
+            return best_answer
+
+    def put(self, document_ids, question_vector, chunk_ids, answer, summary="", history=()):
+        group_key = self._group_key(document_ids, summary, history)
+        entry_id = uuid.uuid4().hex
+
+        with self._lock:
+            group = self._groups.setdefault(group_key, OrderedDict())
+            group[entry_id] = (np.asarray(question_vector, dtype="float32"), frozenset(chunk_ids), answer, time.monotonic())
+            self._lru[(group_key, entry_id)] = None
+
+            while len(group) > self.max_per_document_set:
+                oldest_id = next(iter(group))
+                self._remove_locked(group_key, oldest_id)
+
+            while len(self._lru) > self.max_entries:
+                oldest_key, oldest_id = next(iter(self._lru))
+                self._remove_locked(oldest_key, oldest_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._lru),
+                "groups": len(self._groups),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+answer_cache = AnswerCache(
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    max_per_document_set=ANSWER_CACHE_MAX_PER_DOCUMENT_SET,
+    similarity=ANSWER_CACHE_SIMILARITY,
+    ttl_seconds=ANSWER_CACHE_TTL_SECONDS
+)
@@ -1,27 +1,24 @@
 import glob
 import os
 import shutil
+import time
 import urllib.parse
 from http.client import HTTPException
 
-import pytesseract
 from django.http import FileResponse
-from pdf2image import convert_from_path
-from google import genai
 from google.cloud import texttospeech
 from pydub import AudioSegment
 from rest_framework import status
 from starlette.background import BackgroundTask
 
+import LLMGateway as llm
+import Metrics as metrics
+import Providers as providers
 from dbconnect import get_cursor
+from OCRUtil import read_pdf_pages
 
-pytesseract.pytesseract.tesseract_cmd = os.environ["TESSERACT_PATH"]
-POPPLER_PATH = os.environ["POPPLER_PATH"]
-API_KEY = os.environ.get("GEMINI_API_KEY")
 MODEL = "gemini-2.5-flash-lite"
 
-client = genai.Client(api_key=API_KEY)
-
 try:
     tts_client = texttospeech.TextToSpeechClient()
 except Exception as e:
@@ -40,11 +37,10 @@ def chunk_text(text, chunk_size=500, overlap=50):
 def read_scanned_pdf_with_chunks(file_path, dpi=300, chunk_size=200, overlap=50):
     try:
         file_path = urllib.parse.unquote(file_path)
-        pages = convert_from_path(file_path, dpi=dpi, poppler_path=POPPLER_PATH)
 
         text = ""
-        for page in pages:
-            text += "\n" + pytesseract.image_to_string(page)
+        for page_text in read_pdf_pages(file_path, dpi=dpi):
+            text += "\n" + page_text
 
         return chunk_text(text, chunk_size=chunk_size, overlap=overlap)
 
@@ -77,12 +73,9 @@ def generate_initial_script(summary):
         **DO NOT** use bullet points, asterisks, or headings (like 'Section Title' or 'Key Ideas') in the final script, as these disrupt spoken flow. Present the final script as a single, smooth block of text.
         
         """
-    response = client.models.generate_content(
-        model=MODEL,
-        contents=prompt
-    )
+    response_text = llm.generate(prompt, model=MODEL)
 
-    return response.text.strip().replace('*', '').strip().replace('Intro Hook', '').strip().replace('Core Explanation', '').strip().replace('Quick Review & Call to Action', '')
+    return response_text.strip().replace('*', '').strip().replace('Intro Hook', '').strip().replace('Core Explanation', '').strip().replace('Quick Review & Call to Action', '')
 
 def generate_continued_script(summary):
     prompt = f"""
@@ -110,12 +103,9 @@ def generate_continued_script(summary):
         **DO NOT** use bullet points, asterisks, or headings (like 'Section Title' or 'Key Ideas') in the final script, as these disrupt spoken flow. Present the final script as a single, smooth block of text.
         
         """
-    response = client.models.generate_content(
-        model=MODEL,
-        contents=prompt
-    )
+    response_text = llm.generate(prompt, model=MODEL)
 
-    return response.text.strip().replace('*', '').strip().replace('Core Explanation', '').strip().replace('Quick Review & Call to Action', '')
+    return response_text.strip().replace('*', '').strip().replace('Core Explanation', '').strip().replace('Quick Review & Call to Action', '')
 
 def generate_mp3_title(script):
         prompt = f"""
@@ -127,11 +117,7 @@ def generate_mp3_title(script):
             
             The output must contain only the suggested filename and no other text, punctuation, explanation, or conversational filler.
             """
-        response = client.models.generate_content(
-            model=MODEL,
-            contents=prompt
-        )
-        title = response.text.strip().replace('"', '').replace("'", "")
+        title = llm.generate(prompt, model=MODEL).strip().replace('"', '').replace("'", "")
         return ''.join(c for c in title if c.isalnum() or c in (' ', '_', '-')).strip().replace(' ', '_')
 
 def cleanup_directory(directory_path: str):
@@ -169,41 +155,47 @@ def summarize_chunk(chunk):
         
         - Explanation: (2–3 sentences simplifying the key ideas)
         """
-    response = client.models.generate_content(
-        model=MODEL,
-        contents=prompt
-    )
-    return response.text.strip().replace('*', '')
+    return llm.generate(prompt, model=MODEL, cache=True).strip().replace('*', '')
 
 def text_to_speech(text, audio_file, voice_name='en-US-Wavenet-I'):
     """
     Converts text to speech and SAVES the MP3 audio to the path
     specified by the audio_file variable. It returns nothing.
     """
-    if not tts_client:
-        raise ConnectionError("Cloud TTS Client not initialized.")
+    def synthesize():
+        if not tts_client:
+            raise ConnectionError("Cloud TTS Client not initialized.")
 
-    if text.strip().startswith("<speak>"):
-        synthesis_input = texttospeech.SynthesisInput(ssml=text)
-    else:
-        synthesis_input = texttospeech.SynthesisInput(text=text)
+        if text.strip().startswith("<speak>"):
+            synthesis_input = texttospeech.SynthesisInput(ssml=text)
+        else:
+            synthesis_input = texttospeech.SynthesisInput(text=text)
 
-    voice = texttospeech.VoiceSelectionParams(
-        language_code="en-US",
-        name=voice_name,
-    )
+        voice = texttospeech.VoiceSelectionParams(
+            language_code="en-US",
+            name=voice_name,
+        )
 
-    audio_config = texttospeech.AudioConfig(
-        audio_encoding=texttospeech.AudioEncoding.MP3
-    )
+        audio_config = texttospeech.AudioConfig(
+            audio_encoding=texttospeech.AudioEncoding.MP3
+        )
 
-    response = tts_client.synthesize_speech(
-        input=synthesis_input, voice=voice, audio_config=audio_config
-    )
+        response = tts_client.synthesize_speech(
+            input=synthesis_input, voice=voice, audio_config=audio_config
+        )
+        return response.audio_content
+
+    with metrics.time_stage("tts"):
+        audio_content = providers.call(
+            "tts",
+            {"text": text, "voice": voice_name},
+            live=synthesize,
+            fake=lambda: providers.fake_mp3(text)
+        )
 
     try:
         with open(audio_file, "wb") as out:
-            out.write(response.audio_content)
+            out.write(audio_content)
     except IOError as e:
         print(f"Error saving audio file to {audio_file}: {e}")
         raise
@@ -225,32 +217,35 @@ def blocking_audio_generation_task(session_id: int):
         print(f"Created output directory: {OUTPUT_DIR}")
 
     try:
+        # The connection goes back to the pool before the minutes of LLM and TTS calls below.
         with get_cursor() as cur:
-            cur.execute("SELECT e.chunk_text FROM embeddings e LEFT JOIN sessiondocuments sd ON sd.document_id  = e.document_id WHERE sd.session_id = %s;", (session_id,))
-            session_chunks = cur.fetchall()
+            with metrics.time_stage("retrieve"):
+                cur.execute("SELECT e.chunk_text FROM embeddings e JOIN session_chunk_documents scd ON scd.document_id = e.document_id WHERE scd.session_id = %s;", (session_id,))
+                session_chunks = cur.fetchall()
 
-            # if len(session_chunks) > 30:
-            #     return None, None
+            cur.execute("SELECT s.session_name FROM sessions s WHERE s.session_id = %s;", (session_id,))
+            session_name = cur.fetchone()
+
+        # if len(session_chunks) > 30:
+        #     return None, None
 
-            for i, chunk in enumerate(session_chunks):
+        for i, chunk in enumerate(session_chunks):
 
-                print(f"\nProcessing Chunk {i+1} of {len(session_chunks)}")
+            print(f"\nProcessing Chunk {i+1} of {len(session_chunks)}")
+            with metrics.time_stage("generate"):
                 summary = summarize_chunk(chunk)
                 if(i == 0):
                     script = generate_initial_script(summary)
                 else:
                     script = generate_continued_script(summary)
 
-                base_filename = f"{i+1}.mp3"
+            base_filename = f"{i+1}.mp3"
 
-                audio_file = os.path.join(OUTPUT_DIR, base_filename)
+            audio_file = os.path.join(OUTPUT_DIR, base_filename)
 
-                text_to_speech(script, audio_file, voice_name='en-US-Wavenet-I')
+            text_to_speech(script, audio_file, voice_name='en-US-Wavenet-I')
 
-            print("\nAudios generated for individual chunks! ",)
-
-            cur.execute("SELECT s.session_name FROM sessions s WHERE s.session_id = %s;", (session_id,))
-            session_name = cur.fetchone()
+        print("\nAudios generated for individual chunks! ",)
 
         if session_name:
             audiofile_name = session_name[0]
@@ -262,6 +257,7 @@ def blocking_audio_generation_task(session_id: int):
                 key=lambda x: int(os.path.basename(x).split('.')[0]))
 
         print(f"\nStitching {len(file_paths)} individual audio files...")
+        stitch_started = time.perf_counter()
 
         if not os.path.exists(FILLER_AUDIO_PATH):
             print(f"ERROR: Filler audio not found at {FILLER_AUDIO_PATH}")
@@ -297,6 +293,7 @@ def blocking_audio_generation_task(session_id: int):
             del temp_combined
             del chunk_audio
 
+        metrics.observe_stage("encode", time.perf_counter() - stitch_started)
         print(f"\nAll audios successfully stitched into: {final_output_path}")
 
         return final_output_path, FINAL_AUDIO_FILENAME
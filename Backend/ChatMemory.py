@@ -0,0 +1,147 @@
+import os
+import threading
+
+from dbconnect import get_cursor
+import LLMGateway as llm
+import Metrics as metrics
+from PDFUtil import GEMINI_MODEL_NAME
+
+# Most recent messages (a turn is a User and a Bot message) sent to the LLM verbatim.
+HISTORY_WINDOW_MESSAGES = int(os.environ.get("HISTORY_WINDOW_MESSAGES", 10))
+# Messages that must fall out of the window before they are folded into the summary, so
+# the summarizer runs every few turns rather than after every question.
+SUMMARY_BATCH_MESSAGES = int(os.environ.get("SUMMARY_BATCH_MESSAGES", 6))
+# Most messages folded in a single summarizer call; a long backlog is caught up over several calls.
+SUMMARY_MAX_FOLD_MESSAGES = int(os.environ.get("SUMMARY_MAX_FOLD_MESSAGES", 40))
+
+SESSION_MEMORY_SQL = "SELECT summary, summarized_through FROM session_memory WHERE session_id = %s;"
+
+# Messages not yet covered by the summary, newest HISTORY_WINDOW_MESSAGES + SUMMARY_BATCH_MESSAGES
+# at most, returned oldest first.
+RECENT_HISTORY_SQL = """
+    SELECT sender, message
+    FROM (
+        SELECT message_id, sender, message, created_at
+        FROM chat_history
+        WHERE session_id = %s AND message_id > %s
+        ORDER BY created_at DESC, message_id DESC
+        LIMIT %s
+    ) recent
+    ORDER BY created_at, message_id;
+"""
+
+# Unsummarized messages older than the verbatim window, oldest first.
+PENDING_HISTORY_SQL = """
+    WITH window_messages AS (
+        SELECT message_id
+        FROM chat_history
+        WHERE session_id = %(session_id)s
+        ORDER BY created_at DESC, message_id DESC
+        LIMIT %(window)s
+    )
+    SELECT message_id, sender, message
+    FROM chat_history
+    WHERE session_id = %(session_id)s
+      AND message_id > %(summarized_through)s
+      AND message_id < (SELECT min(message_id) FROM window_messages)
+    ORDER BY created_at, message_id
+    LIMIT %(limit)s;
+"""
+
+_summarizing = set()
+_summarizing_lock = threading.Lock()
+
+
+async def load_chat_memory_async(cur, session_id: int):
+    """
+    Returns (summary, recent_lines) for the session: the running summary of older turns
+    and the formatted recent messages not yet folded into it. Both are bounded, so the
+    read does not grow with the length of the conversation.
+    """
+    await cur.execute(SESSION_MEMORY_SQL, (session_id,))
+    row = await cur.fetchone()
+    summary, summarized_through = row if row else ("", 0)
+
+    await cur.execute(
+        RECENT_HISTORY_SQL,
+        (session_id, summarized_through, HISTORY_WINDOW_MESSAGES + SUMMARY_BATCH_MESSAGES)
+    )
+    recent_lines = [f"{sender}: {message}" for sender, message in await cur.fetchall()]
+
+    return summary, recent_lines
+
+
+def summarize_history(previous_summary: str, lines) -> str:
+    """Folds the given chat lines into the previous running summary."""
+    prompt = f"""
+    You maintain a running summary of a study conversation between a student (User) and
+    a tutor (Bot). Update the summary with the new messages below. Keep the facts,
+    definitions, questions asked and conclusions reached that later questions may refer
+    to; drop pleasantries. Reply with the updated summary only, at most 250 words.
+
+    --- Current Summary ---
+    {previous_summary or "(empty)"}
+    -----------------------
+
+    --- New Messages ---
+    {chr(10).join(lines)}
+    --------------------
+    """
+
+    with metrics.time_stage("summarize"):
+        return llm.generate(prompt, model=GEMINI_MODEL_NAME).strip()
+
+
+def update_session_memory(session_id: int):
+    """
+    Folds messages that have left the verbatim window into the session's running summary.
+    Meant to run in the background after a chat turn is saved; does nothing until at least
+    SUMMARY_BATCH_MESSAGES messages are pending, or while another update for the session runs.
+    """
+    with _summarizing_lock:
+        if session_id in _summarizing:
+            return
+        _summarizing.add(session_id)
+
+    try:
+        with get_cursor() as cur:
+            cur.execute(SESSION_MEMORY_SQL, (session_id,))
+            row = cur.fetchone()
+            summary, summarized_through = row if row else ("", 0)
+
+            cur.execute(PENDING_HISTORY_SQL, {
+                "session_id": session_id,
+                "window": HISTORY_WINDOW_MESSAGES,
+                "summarized_through": summarized_through,
+                "limit": SUMMARY_MAX_FOLD_MESSAGES,
+            })
+            pending = cur.fetchall()
+
+        if len(pending) < SUMMARY_BATCH_MESSAGES:
+            return
+
+        # The LLM call runs without holding a pooled connection.
+        new_summary = summarize_history(summary, [f"{sender}: {message}" for _, sender, message in pending])
+
+        with get_cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO session_memory (session_id, summary, summarized_through, updated_at)
+                VALUES (%s, %s, %s, now())
+                ON CONFLICT (session_id) DO UPDATE
+                SET summary = EXCLUDED.summary,
+                    summarized_through = EXCLUDED.summarized_through,
+                    updated_at = EXCLUDED.updated_at
+                WHERE session_memory.summarized_through < EXCLUDED.summarized_through;
+                """,
+                (session_id, new_summary, pending[-1][0])
+            )
+
+        print(f"Session {session_id} memory now summarizes through message {pending[-1][0]}.")
+
+    except Exception as e:
+        print(f"Updating chat memory for session {session_id} failed: {e}")
+
+    finally:
+        with _summarizing_lock:
+            _summarizing.discard(session_id)
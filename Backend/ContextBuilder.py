@@ -0,0 +1,114 @@
+import os
+from typing import List
+
+import numpy as np
+
+from Retrieval import RetrievedChunk
+
+# Approximate prompt tokens the assembled context may use.
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", 12000))
+# Relevance/diversity trade-off for maximal marginal relevance: 1.0 ignores diversity.
+MMR_LAMBDA = float(os.environ.get("MMR_LAMBDA", 0.7))
+# Longest run of words adjacent chunks are checked for sharing (ingestion overlaps them by 50).
+MAX_CHUNK_OVERLAP_WORDS = int(os.environ.get("MAX_CHUNK_OVERLAP_WORDS", 100))
+
+CHARS_PER_TOKEN = 4
+SECTION_SEPARATOR = "\n\n---\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _overlap_length(previous_words, next_words):
+    """Returns how many leading words of next_words repeat the tail of previous_words."""
+    for length in range(min(MAX_CHUNK_OVERLAP_WORDS, len(previous_words), len(next_words)), 0, -1):
+        if previous_words[-length:] == next_words[:length]:
+            return length
+    return 0
+
+
+def merge_chunks(chunks: List[RetrievedChunk]) -> List[str]:
+    """
+    Orders chunks by document and position, joins runs of consecutive chunk_index values
+    into a single passage and drops the words each chunk repeats from its predecessor.
+    """
+    passages = []
+    previous = None
+    words = []
+
+    for chunk in sorted(chunks, key=lambda c: (c.document_id, c.chunk_index)):
+        chunk_words = (chunk.chunk_text or "").split()
+        if not chunk_words:
+            continue
+
+        adjacent = (
+            previous is not None
+            and previous.document_id == chunk.document_id
+            and previous.chunk_index + 1 == chunk.chunk_index
+        )
+        if adjacent:
+            words.extend(chunk_words[_overlap_length(words, chunk_words):])
+        else:
+            if words:
+                passages.append(" ".join(words))
+            words = list(chunk_words)
+        previous = chunk
+
+    if words:
+        passages.append(" ".join(words))
+    return passages
+
+
+def mmr_order(chunks: List[RetrievedChunk], query_vector, mmr_lambda: float) -> List[RetrievedChunk]:
+    """
+    Orders chunks by maximal marginal relevance to query_vector, so each pick trades its
+    similarity to the query against its similarity to the chunks already picked. Chunks
+    are returned in their retrieval order when their embeddings are not available.
+    """
+    if len(chunks) <= 1 or query_vector is None or any(chunk.embedding is None for chunk in chunks):
+        return list(chunks)
+
+    vectors = np.vstack([np.asarray(chunk.embedding, dtype="float32") for chunk in chunks])
+    relevance = vectors @ np.asarray(query_vector, dtype="float32")
+    similarity = vectors @ vectors.T
+
+    remaining = list(range(len(chunks)))
+    max_similarity = np.full(len(chunks), -np.inf, dtype="float32")
+    ordered = []
+
+    while remaining:
+        redundancy = np.where(np.isfinite(max_similarity[remaining]), max_similarity[remaining], 0.0)
+        scores = mmr_lambda * relevance[remaining] - (1 - mmr_lambda) * redundancy
+        best = remaining.pop(int(np.argmax(scores)))
+        ordered.append(chunks[best])
+        max_similarity = np.maximum(max_similarity, similarity[best])
+
+    return ordered
+
+
+def build_context(chunks: List[RetrievedChunk], query_vector=None, token_budget=None, mmr_lambda=None) -> str:
+    """
+    Assembles retrieved chunks into the LLM context: chunks are taken in MMR order until
+    the merged, overlap-free text would exceed token_budget, then emitted in reading order.
+    """
+    token_budget = token_budget or CONTEXT_TOKEN_BUDGET
+    mmr_lambda = MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+
+    selected = []
+    context_text = ""
+    for chunk in mmr_order(chunks, query_vector, mmr_lambda):
+        candidate_text = SECTION_SEPARATOR.join(merge_chunks(selected + [chunk]))
+        if selected and estimate_tokens(candidate_text) > token_budget:
+            break
+        selected.append(chunk)
+        context_text = candidate_text
+
+    if selected:
+        raw_tokens = sum(estimate_tokens(chunk.chunk_text or "") for chunk in chunks)
+        print(
+            f"Context: {len(selected)} of {len(chunks)} chunks, "
+            f"~{estimate_tokens(context_text)} tokens (from ~{raw_tokens} retrieved)"
+        )
+
+    return context_text
@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+EMBED_MODEL_NAME = os.environ.get("EMBED_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+EMBED_DIMENSION = 384
+EMBED_ENCODE_BATCH_SIZE = int(os.environ.get("EMBED_ENCODE_BATCH_SIZE", 32))
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", 2048))
+# Entries older than this are re-encoded; 0 disables expiry.
+QUERY_CACHE_TTL_SECONDS = float(os.environ.get("QUERY_CACHE_TTL_SECONDS", 3600))
+
+_model = None
+_model_lock = threading.Lock()
+
+_query_cache = OrderedDict()
+_pinned_queries = {}
+_query_cache_lock = threading.Lock()
+_query_cache_hits = 0
+_query_cache_misses = 0
+
+
+def get_model():
+    """
+    Returns the process-wide SentenceTransformer, loading it on first use.
+    Every module shares this instance instead of holding its own copy.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+
+                print(f"Loading embedding model {EMBED_MODEL_NAME}...")
+                _model = SentenceTransformer(EMBED_MODEL_NAME)
+    return _model
+
+
+def encode(texts, batch_size=None):
+    """Embeds a list of texts as normalized float32 vectors, one row per text."""
+    return get_model().encode(
+        list(texts),
+        batch_size=batch_size or EMBED_ENCODE_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=True
+    ).astype("float32")
+
+
+def encode_documents(chunks, batch_size=None):
+    """Embeds document chunks for storage."""
+    return encode(chunks, batch_size=batch_size)
+
+
+def encode_queries(queries):
+    """Embeds a batch of search queries."""
+    return encode(queries)
+
+
+def _query_key(query):
+    return " ".join(query.split())
+
+
+def _cache_lookup(key):
+    global _query_cache_hits, _query_cache_misses
+    with _query_cache_lock:
+        vector = _pinned_queries.get(key)
+        if vector is None:
+            entry = _query_cache.get(key)
+            if entry is not None:
+                vector, stored_at = entry
+                if QUERY_CACHE_TTL_SECONDS and time.monotonic() - stored_at > QUERY_CACHE_TTL_SECONDS:
+                    del _query_cache[key]
+                    vector = None
+                else:
+                    _query_cache.move_to_end(key)
+
+        if vector is None:
+            _query_cache_misses += 1
+        else:
+            _query_cache_hits += 1
+        return vector
+
+
+def _cache_store(key, vector):
+    with _query_cache_lock:
+        _query_cache[key] = (vector, time.monotonic())
+        _query_cache.move_to_end(key)
+        while len(_query_cache) > QUERY_CACHE_SIZE:
+            _query_cache.popitem(last=False)
+
+
+def encode_query(query):
+    """
+    Embeds a single search query and returns its (read-only) vector. Repeated queries
+    are served from a bounded LRU cache instead of running the model again.
+    """
+    key = _query_key(query)
+    vector = _cache_lookup(key)
+    if vector is not None:
+        return vector
+
+    vector = encode_queries([key])[0]
+    vector.setflags(write=False)
+    if QUERY_CACHE_SIZE > 0:
+        _cache_store(key, vector)
+    return vector
+
+
+def precompute_queries(queries):
+    """
+    Embeds fixed queries (e.g. the summary and flashcard prompts) in one batch and pins
+    them in the cache so they are never evicted or expired.
+    """
+    keys = [_query_key(query) for query in queries]
+    vectors = encode_queries(keys)
+    with _query_cache_lock:
+        for key, vector in zip(keys, vectors):
+            vector.setflags(write=False)
+            _pinned_queries[key] = vector
+
+
+def query_cache_stats():
+    with _query_cache_lock:
+        return {
+            "size": len(_query_cache),
+            "pinned": len(_pinned_queries),
+            "max_size": QUERY_CACHE_SIZE,
+            "hits": _query_cache_hits,
+            "misses": _query_cache_misses,
+        }
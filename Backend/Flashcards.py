@@ -3,21 +3,16 @@ import json
 import sys
 from typing import List, Dict
 from pydantic import BaseModel, Field
-from google import genai
-from google.genai import types
-from sentence_transformers import SentenceTransformer
-
+import LLMGateway as llm
+import Metrics as metrics
 from dbconnect import get_cursor
+from EmbeddingModel import encode_query
+from Retrieval import search_session_chunks
+from ContextBuilder import build_context
 
 GEMINI_MODEL_NAME = "gemini-2.5-flash-lite"
-LOCAL_EMBED_MODEL = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
 FLASHCARD_CHUNK_LIMIT = 75
-
-try:
-    CLIENT = genai.Client()
-except Exception as e:
-    print(f"CRITICAL ERROR: Failed to initialize Gemini Client. Check GEMINI_API_KEY. {e}", file=sys.stderr)
-    sys.exit(1)
+FLASHCARD_QUERY = "Extract all key facts, definitions, and concepts for creating 15 flashcards."
 
 
 class Flashcard(BaseModel):
@@ -31,44 +26,31 @@ class FlashcardSet(BaseModel):
 
 
 
-def get_rag_context(session_id: int, summarization_query: str, k: int) -> str:
+def get_rag_context(session_id: int, summarization_query: str, k: int, retrieval_mode: str = None) -> str:
     """
-    RAG Context Retrieval: Generates query embedding using the local SentenceTransformer
+    RAG Context Retrieval: Generates query embedding using the shared local embedding model
     and fetches relevant chunks from the database based on the session_id.
     """
 
     try:
-        query_vector = LOCAL_EMBED_MODEL.encode(
-            [summarization_query],
-            convert_to_numpy=True,
-            normalize_embeddings=True
-        ).astype("float32")
-        query_embedding = query_vector[0].tolist()
+        with metrics.time_stage("embed"):
+            query_embedding = encode_query(summarization_query)
     except Exception as e:
         raise RuntimeError(f"Failed to generate embedding for query using local model: {e}")
 
-    query_vector_string = '[' + ','.join(map(str, query_embedding)) + ']'
-
     try:
-        with get_cursor() as cursor:
-            print(f" Executing vector search for session {session_id}...")
-
-            sql_query = """
-                SELECT  e.chunk_text 
-                FROM embeddings e
-                LEFT JOIN sessiondocuments s on s.document_id = e.document_id 
-                WHERE  s.session_id = %s 
-                ORDER BY e.embedding <=> %s::vector
-                LIMIT %s;
-            """
+        with metrics.time_stage("retrieve"), get_cursor() as cursor:
+            print(f" Executing {retrieval_mode or 'default'} search for session {session_id}...")
 
-            cursor.execute(sql_query, (session_id, query_vector_string, k))
-            chunks = cursor.fetchall()
+            chunks = search_session_chunks(
+                cursor, session_id, query_embedding, k, mode=retrieval_mode, query_text=summarization_query
+            )
 
     except Exception as e:
         raise RuntimeError(f"Database query failed during RAG context retrieval: {e}")
 
-    context_text = "\n\n---\n\n".join([row[0] for row in chunks if isinstance(row, tuple) and len(row) > 0])
+    with metrics.time_stage("context"):
+        context_text = build_context(chunks, query_embedding)
 
     if not context_text:
         print(f"Warning: RAG query returned 0 chunks for session ID {session_id}.")
@@ -94,20 +76,18 @@ def generate_flashcards(context: str) -> List[Dict[str, str]]:
     """
 
     try:
-        config = types.GenerateContentConfig(
-            system_instruction=system_prompt,
-            temperature=0.4,
-            response_mime_type="application/json",
-            response_schema=FlashcardSet,
-        )
-
-        response = CLIENT.models.generate_content(
-            model=GEMINI_MODEL_NAME,
-            contents=user_prompt,
-            config=config
-        )
-
-        flashcard_data = json.loads(response.text)
+        with metrics.time_stage("generate"):
+            response_text = llm.generate(
+                user_prompt,
+                model=GEMINI_MODEL_NAME,
+                system_instruction=system_prompt,
+                temperature=0.4,
+                response_mime_type="application/json",
+                response_schema=FlashcardSet,
+                cache=True
+            )
+
+        flashcard_data = json.loads(response_text)
         return flashcard_data.get('flashcards', [])
 
     except Exception as e:
@@ -116,13 +96,14 @@ def generate_flashcards(context: str) -> List[Dict[str, str]]:
 
 
 
-def run_flashcard_job(session_id: int, db_connection_service) -> List[Dict[str, str]]:
+def run_flashcard_job(session_id: int, db_connection_service, retrieval_mode: str = None) -> List[Dict[str, str]]:
     """
     Orchestrates the flashcard generation process. RAG context is handled internally.
 
     Args:
         session_id: The ID of the session.
         db_connection_service: An object with update_session_status method.
+        retrieval_mode: "vector" or "hybrid"; None uses the configured default.
 
     Returns:
         A list of generated flashcards.
@@ -130,9 +111,9 @@ def run_flashcard_job(session_id: int, db_connection_service) -> List[Dict[str,
     try:
         db_connection_service.update_session_status(session_id, "Processing: Generating Flashcards")
 
-        flashcard_query = "Extract all key facts, definitions, and concepts for creating 15 flashcards."
+        flashcard_query = FLASHCARD_QUERY
 
-        context_text = get_rag_context(session_id, flashcard_query, FLASHCARD_CHUNK_LIMIT)
+        context_text = get_rag_context(session_id, flashcard_query, FLASHCARD_CHUNK_LIMIT, retrieval_mode)
 
         if not context_text:
             db_connection_service.update_session_status(session_id, "Failed: No context found")
@@ -0,0 +1,344 @@
+import contextvars
+import hashlib
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg2.extras import Json
+
+import Metrics as metrics
+from dbconnect import get_cursor, get_async_cursor, copy_embeddings
+from PDFUtil import stream_embedded_chunks, generate_session_name
+from SessionIndexCache import session_index_cache
+
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", 2))
+# Finished jobs are kept this long so clients can still poll their result.
+JOB_RETENTION_SECONDS = int(os.environ.get("JOB_RETENTION_SECONDS", 3600))
+# Unfinished jobs not updated for this long belong to a worker that died; they are marked failed.
+JOB_STALE_SECONDS = int(os.environ.get("JOB_STALE_SECONDS", 3600))
+# Minimum interval between page-progress writes to the job row.
+JOB_PROGRESS_INTERVAL_SECONDS = float(os.environ.get("JOB_PROGRESS_INTERVAL_SECONDS", 1.0))
+# How long an upload of a document that another job is still embedding stays off the
+# workers before it checks on that job again.
+DEDUP_POLL_SECONDS = float(os.environ.get("DEDUP_POLL_SECONDS", 2.0))
+# Embedding rows buffered per COPY round trip.
+EMBED_COPY_ROWS = int(os.environ.get("EMBED_COPY_ROWS", 2000))
+
+JOB_COLUMNS = (
+    "job_id", "status", "stage", "progress", "pages_done", "page_count", "chunks_embedded",
+    "deduplicated", "result", "error", "created_at", "updated_at"
+)
+JOB_STATUSES = ("queued", "running", "completed", "failed")
+
+executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+
+
+def _update_job(job_id, **fields):
+    """Writes the given job fields (column names from JOB_COLUMNS) in their own transaction."""
+    assignments = ", ".join(f"{name} = %s" for name in fields)
+    values = [Json(value) if name == "result" else value for name, value in fields.items()]
+    with get_cursor() as cur:
+        cur.execute(
+            f"UPDATE ingest_jobs SET {assignments}, updated_at = now() WHERE job_id = %s;",
+            values + [job_id]
+        )
+
+
+def _expire_jobs(cur):
+    cur.execute(
+        """
+        DELETE FROM ingest_jobs
+        WHERE status IN ('completed', 'failed') AND updated_at < now() - make_interval(secs => %s);
+        """,
+        (JOB_RETENTION_SECONDS,)
+    )
+    cur.execute(
+        """
+        UPDATE ingest_jobs
+        SET status = 'failed', stage = 'failed', error = 'The ingestion job was interrupted.', updated_at = now()
+        WHERE status IN ('queued', 'running') AND updated_at < now() - make_interval(secs => %s);
+        """,
+        (JOB_STALE_SECONDS,)
+    )
+
+
+def hash_file(file_path: str) -> str:
+    """Returns the hex SHA-256 of the file's bytes."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while block := f.read(1024 * 1024):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_processed_document(cur, content_hash: str):
+    """Returns the id of the fully embedded document holding this content's chunks, if any."""
+    cur.execute(
+        """
+        SELECT d.document_id
+        FROM "document" d
+        WHERE d.content_hash = %s
+          AND d.content_document_id IS NULL
+          AND d.embedded_at IS NOT NULL
+        ORDER BY d.document_id
+        LIMIT 1;
+        """,
+        (content_hash,)
+    )
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+async def get_job_async(job_id: str):
+    """Returns the job as a dict, or None if it is unknown or has expired."""
+    async with get_async_cursor() as cur:
+        await cur.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM ingest_jobs WHERE job_id = %s;", (job_id,))
+        row = await cur.fetchone()
+    return dict(zip(JOB_COLUMNS, row)) if row is not None else None
+
+
+def job_counts():
+    """Returns the number of retained jobs in each status, across all workers."""
+    with get_cursor() as cur:
+        cur.execute("SELECT status, count(*) FROM ingest_jobs GROUP BY status;")
+        counts = dict(cur.fetchall())
+    return {status: counts.get(status, 0) for status in JOB_STATUSES}
+
+
+def submit_ingestion(file_path: str, filename: str, user_id: int, session_id=None) -> str:
+    """Queues an uploaded PDF for ingestion and returns the job id to poll."""
+    job_id = uuid.uuid4().hex
+    with get_cursor() as cur:
+        _expire_jobs(cur)
+        cur.execute("INSERT INTO ingest_jobs (job_id) VALUES (%s);", (job_id,))
+
+    # Runs in the submitter's context, so the job's stage timings are attributed to its request.
+    executor.submit(contextvars.copy_context().run, ingest_document, job_id, file_path, filename, user_id, session_id)
+    return job_id
+
+
+def _requeue(delay, job_id, *args):
+    """Resubmits the job after delay seconds without holding an ingest worker meanwhile."""
+    context = contextvars.copy_context()
+    timer = threading.Timer(delay, executor.submit, (context.run, ingest_document, job_id, *args))
+    timer.daemon = True
+    timer.start()
+
+
+def claim_document(job_id: str, content_hash: str, filename: str, file_path: str, user_id: int):
+    """
+    Decides, under a short advisory lock on the content hash, who embeds the document.
+    Every upload gets its own document row with its title and uploader. Returns
+    ("reuse", document_id) for a row pointing at the chunks of identical bytes already
+    embedded, ("wait", None) if another live job is embedding them, or ("embed",
+    document_id) for a new row this job embeds. Partial documents left by failed or dead
+    jobs are removed.
+    """
+    with get_cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(hashtextextended(%s, 0));", (content_hash,))
+
+        content_document_id = find_processed_document(cur, content_hash)
+        if content_document_id is not None:
+            cur.execute(
+                """
+                INSERT INTO document (document_title, user_id, content_hash, content_document_id)
+                VALUES (%s, %s, %s, %s)
+                RETURNING document_id;
+                """,
+                (filename, user_id, content_hash, content_document_id)
+            )
+            return "reuse", cur.fetchone()[0]
+
+        cur.execute(
+            """
+            SELECT EXISTS (
+                SELECT 1
+                FROM "document" d
+                JOIN ingest_jobs j ON j.job_id = d.ingest_job_id
+                WHERE d.content_hash = %s
+                  AND d.content_document_id IS NULL
+                  AND d.embedded_at IS NULL
+                  AND j.status IN ('queued', 'running')
+                  AND j.updated_at >= now() - make_interval(secs => %s)
+            );
+            """,
+            (content_hash, JOB_STALE_SECONDS)
+        )
+        if cur.fetchone()[0]:
+            return "wait", None
+
+        cur.execute(
+            'DELETE FROM "document" WHERE content_hash = %s AND content_document_id IS NULL AND embedded_at IS NULL;',
+            (content_hash,)
+        )
+
+        with open(file_path, "rb") as f:
+            pdf_content_bytes = f.read()
+
+        cur.execute(
+            """
+            INSERT INTO document (document_title, pdf_content, user_id, content_hash, ingest_job_id)
+            VALUES (%s, %s, %s, %s, %s)
+            RETURNING document_id;
+            """,
+            (filename, pdf_content_bytes, user_id, content_hash, job_id)
+        )
+        return "embed", cur.fetchone()[0]
+
+
+def embed_document(job_id: str, document_id: int, file_path: str):
+    """
+    Extracts, chunks and embeds the file into the document's embeddings. Each COPY batch
+    commits on its own, so no connection is held during extraction and embedding.
+    """
+    last_progress_write = 0.0
+
+    def on_page(pages_done, page_count):
+        # Text extraction and embedding run interleaved, so pages account for most of the work.
+        nonlocal last_progress_write
+        now = time.monotonic()
+        if now - last_progress_write >= JOB_PROGRESS_INTERVAL_SECONDS or pages_done == page_count:
+            last_progress_write = now
+            _update_job(job_id, pages_done=pages_done, page_count=page_count, progress=round(0.9 * pages_done / page_count, 3))
+
+    chunk_count, pending_rows = 0, []
+    for start_index, chunks, vectors in stream_embedded_chunks(
+        file_path, chunk_size=200, overlap=50, progress_callback=on_page
+    ):
+        pending_rows.extend(
+            (document_id, start_index + i, chunks[i], vector)
+            for i, vector in enumerate(vectors)
+        )
+        chunk_count += len(chunks)
+
+        if len(pending_rows) >= EMBED_COPY_ROWS:
+            with metrics.time_stage("insert"), get_cursor() as cur:
+                copy_embeddings(cur, pending_rows)
+            pending_rows = []
+            _update_job(job_id, stage="embedding", chunks_embedded=chunk_count)
+
+    if pending_rows:
+        with metrics.time_stage("insert"), get_cursor() as cur:
+            copy_embeddings(cur, pending_rows)
+
+    with get_cursor() as cur:
+        cur.execute('UPDATE "document" SET embedded_at = now() WHERE document_id = %s;', (document_id,))
+
+    _update_job(job_id, stage="embedding", chunks_embedded=chunk_count)
+    print(f"All vectors uploaded successfully ({chunk_count} chunks).")
+
+
+def ingest_document(job_id: str, file_path: str, filename: str, user_id: int, session_id=None, content_hash=None):
+    """
+    Extracts, embeds and stores vectors using pgvector, reporting progress on the job.
+    content_hash is only passed when the job is re-queued to wait for a duplicate.
+    """
+
+    first_attempt = content_hash is None
+    if first_attempt:
+        print(f"Ingesting document for job {job_id}...")
+        _update_job(job_id, status="running", stage="extracting")
+    owned_document_id = None
+    requeued = False
+
+    try:
+        if first_attempt:
+            content_hash = hash_file(file_path)
+
+            if session_id is not None:
+                with get_cursor() as cur:
+                    cur.execute(
+                        "SELECT EXISTS(SELECT 1 FROM sessions WHERE session_id = %s);",
+                        (session_id,)
+                    )
+                    if not cur.fetchone()[0]:
+                        raise Exception(f"Provided session ID {session_id} is not found in the database.")
+
+        # Concurrent uploads of the same bytes: one embeds; the others are re-queued until
+        # they can reuse its embeddings, so a waiting upload never occupies a worker.
+        outcome, document_id = claim_document(job_id, content_hash, filename, file_path, user_id)
+        if outcome == "wait":
+            _update_job(job_id, stage="waiting")
+            _requeue(DEDUP_POLL_SECONDS, job_id, file_path, filename, user_id, session_id, content_hash)
+            requeued = True
+            return
+
+        if outcome == "reuse":
+            # The row only points at shared chunks, so it is dropped if linking it fails.
+            owned_document_id = document_id
+            print(f"Identical document already processed; document {document_id} reuses its embeddings.")
+            _update_job(job_id, stage="deduplicated", progress=0.9, deduplicated=True)
+        else:
+            owned_document_id = document_id
+            embed_document(job_id, document_id, file_path)
+            owned_document_id = None
+
+        # The LLM call runs without holding a pooled connection.
+        _update_job(job_id, stage="naming", progress=0.95)
+        with metrics.time_stage("generate"):
+            session_name = generate_session_name(filename)
+
+        _update_job(job_id, stage="storing")
+        with get_cursor() as cur:
+            if session_id is None:
+                cur.execute(
+                    "INSERT INTO sessions (user_id, session_name) VALUES (%s, %s) RETURNING session_id;",
+                    (user_id, session_name)
+                )
+                sessionResult = cur.fetchone()
+
+                if not sessionResult:
+                    raise Exception("Failed to retrieve session ID.")
+
+                session_id = sessionResult[0]
+                print(f"Session created with ID: {session_id}")
+
+            cur.execute(
+                """
+                INSERT INTO sessiondocuments (session_id, document_id) VALUES (%s, %s)
+                ON CONFLICT (session_id, document_id) DO NOTHING
+                RETURNING id;
+                """,
+                (session_id, document_id)
+            )
+            sessionDocumentResult = cur.fetchone()
+
+            if sessionDocumentResult:
+                print(f"SessionDocument entry created with ID: {sessionDocumentResult[0]}")
+            else:
+                print(f"Document {document_id} is already part of session {session_id}.")
+        owned_document_id = None
+
+        # The session's document set changed, so its cached FAISS index is stale.
+        session_index_cache.invalidate(session_id)
+
+        _update_job(
+            job_id,
+            status="completed",
+            stage="completed",
+            progress=1.0,
+            result={
+                "message": "Document uploaded and processed successfully",
+                "document_id": document_id,
+                "session_id": session_id,
+                "session_name": session_name
+            }
+        )
+
+    except Exception as e:
+        print(f"Ingestion job {job_id} failed: {e}")
+        try:
+            if owned_document_id is not None:
+                # Drops the partial document and, by cascade, the embeddings written so far.
+                with get_cursor() as cur:
+                    cur.execute('DELETE FROM "document" WHERE document_id = %s;', (owned_document_id,))
+            _update_job(job_id, status="failed", stage="failed", error=f"The document upload or processing failed: {e}")
+        except Exception as cleanup_error:
+            print(f"Recording the failure of ingestion job {job_id} failed: {cleanup_error}")
+
+    finally:
+        if not requeued and os.path.exists(file_path):
+            os.remove(file_path)
+            print(f"Successfully removed temporary file: {file_path}")
@@ -0,0 +1,432 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
+from dotenv import load_dotenv
+from google import genai
+from google.genai import errors, types
+
+import Providers as providers
+from PromptCache import prompt_cache, prompt_key
+
+load_dotenv()
+
+DEFAULT_MODEL = os.environ.get("LLM_DEFAULT_MODEL", "gemini-2.5-flash")
+# Calls in flight at once across the process, sync and async callers combined.
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 8))
+# Token bucket: sustained requests per second and the burst allowed above it.
+LLM_RATE_PER_SECOND = float(os.environ.get("LLM_RATE_PER_SECOND", 4))
+LLM_RATE_BURST = int(os.environ.get("LLM_RATE_BURST", 8))
+# Deadline for a whole call, including waiting for a slot, rate limiting and retries.
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", 120))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 4))
+LLM_BACKOFF_BASE_SECONDS = float(os.environ.get("LLM_BACKOFF_BASE_SECONDS", 1))
+LLM_BACKOFF_MAX_SECONDS = float(os.environ.get("LLM_BACKOFF_MAX_SECONDS", 30))
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """A generation call failed after exhausting its retries."""
+
+
+class LLMTimeout(LLMError):
+    """A generation call did not finish before its deadline."""
+
+
+class ConcurrencyLimiter:
+    """
+    Counting semaphore shared by threads and event-loop tasks. Threads block on a
+    condition; coroutines wait on a future that release() resolves on their loop,
+    so waiting never ties up a worker thread.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_use = 0
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._async_waiters = deque()
+
+    def _try_acquire_locked(self):
+        if self.in_use < self.limit:
+            self.in_use += 1
+            return True
+        return False
+
+    def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self._available:
+            while not self._try_acquire_locked():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._available.wait(remaining):
+                    if not self._try_acquire_locked():
+                        raise LLMTimeout("Timed out waiting for a free LLM slot.")
+                    return
+
+    async def acquire_async(self, timeout):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_acquire_locked():
+                return
+            waiter = loop.create_future()
+            self._async_waiters.append((loop, waiter))
+
+        try:
+            # release() hands its slot directly to the waiter it resolves.
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except BaseException as e:
+            with self._lock:
+                try:
+                    self._async_waiters.remove((loop, waiter))
+                    handed_over = False
+                except ValueError:
+                    handed_over = True
+            if handed_over:
+                # The slot was already given to us; pass it on once the hand-off lands.
+                waiter.add_done_callback(lambda _: self.release())
+            if isinstance(e, asyncio.TimeoutError):
+                raise LLMTimeout("Timed out waiting for a free LLM slot.") from None
+            raise
+
+    def release(self):
+        with self._lock:
+            while self._async_waiters:
+                loop, waiter = self._async_waiters.popleft()
+                if not waiter.done():
+                    loop.call_soon_threadsafe(_resolve, waiter)
+                    return
+            self.in_use -= 1
+            self._available.notify()
+
+    def stats(self):
+        with self._lock:
+            return {"limit": self.limit, "in_use": self.in_use, "waiting_async": len(self._async_waiters)}
+
+
+def _resolve(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class TokenBucket:
+    """Rate limiter; reserve() takes a token now and returns how long to wait before using it."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > max_wait:
+                raise LLMTimeout("LLM rate limit would delay the call past its deadline.")
+            self._tokens -= 1
+            return wait
+
+
+limiter = ConcurrencyLimiter(LLM_MAX_CONCURRENCY)
+bucket = TokenBucket(LLM_RATE_PER_SECOND, LLM_RATE_BURST)
+
+_client = None
+_client_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "retries": 0, "failures": 0, "timeouts": 0}
+
+
+def get_client():
+    """Returns the process-wide google.genai client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
+    return _client
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _is_retryable(error):
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    return isinstance(error, httpx.TransportError)
+
+
+def _backoff(attempt):
+    """Full-jitter exponential backoff for the given (0-based) retry."""
+    return random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def _build_config(remaining, config):
+    """GenerateContentConfig for one attempt, with the HTTP timeout capped at the remaining deadline."""
+    return types.GenerateContentConfig(
+        **config,
+        http_options=types.HttpOptions(timeout=max(1, int(remaining * 1000)))
+    )
+
+
+def _cache_key(model, contents, config):
+    # Fake and replayed responses are cached apart from live ones so they never leak into live use.
+    mode = providers.get_mode("text")
+    return prompt_key(model if mode in ("live", "record") else f"{mode}:{model}", contents, config)
+
+
+def _provider_request(model, contents, config):
+    """Description of a request used to address its recording in record/replay mode."""
+    return {"model": model, "contents": contents, "config": config}
+
+
+class _Call:
+    """Deadline and retry bookkeeping for one gateway call."""
+
+    def __init__(self, timeout):
+        self.deadline = time.monotonic() + (timeout or LLM_TIMEOUT_SECONDS)
+        self.attempt = 0
+
+    def remaining(self):
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            _count("timeouts")
+            raise LLMTimeout("LLM call exceeded its deadline.")
+        return remaining
+
+    def retry_delay(self, error):
+        """Returns the delay before retrying after error, or re-raises it as final."""
+        if not _is_retryable(error) or self.attempt >= LLM_MAX_RETRIES:
+            _count("failures")
+            raise LLMError(f"LLM call failed: {error}") from error
+
+        delay = _backoff(self.attempt)
+        if time.monotonic() + delay >= self.deadline:
+            _count("timeouts")
+            raise LLMTimeout(f"LLM call exceeded its deadline while retrying: {error}") from error
+
+        self.attempt += 1
+        _count("retries")
+        print(f"LLM call failed ({error}); retry {self.attempt} of {LLM_MAX_RETRIES} in {delay:.1f}s")
+        return delay
+
+
+def _ensure_off_event_loop(name):
+    # Waiting for a slot or a rate-limit token would block the loop that async callers
+    # need in order to release their slots, freezing the worker until the call times out.
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    raise RuntimeError(
+        f"LLMGateway.{name} blocks and must not run on the event loop; "
+        f"use its async variant or asyncio.to_thread."
+    )
+
+
+def generate(contents, model=None, timeout=None, cache=False, **config) -> str:
+    """
+    Generates text with Gemini and returns it. config holds GenerateContentConfig fields
+    (system_instruction, temperature, response_mime_type, response_schema, ...). The call
+    is rate limited, bounded by LLM_MAX_CONCURRENCY, retried with backoff on 429/5xx and
+    transport errors, and raises LLMTimeout if it cannot finish within timeout seconds.
+    With cache=True an identical earlier request is answered from the prompt cache.
+    Blocks the calling thread, so it must not be called from the event loop.
+    """
+    _ensure_off_event_loop("generate")
+    model = model or DEFAULT_MODEL
+    if not cache:
+        return _generate(contents, model, timeout, config)
+
+    key = _cache_key(model, contents, config)
+    text = prompt_cache.get(key)
+    if text is None:
+        text = _generate(contents, model, timeout, config)
+        if text:
+            prompt_cache.put(key, text)
+    return text
+
+
+def _generate(contents, model, timeout, config):
+    call = _Call(timeout)
+    _count("calls")
+
+    limiter.acquire(call.remaining())
+    try:
+        while True:
+            time.sleep(bucket.reserve(call.remaining()))
+            try:
+                return providers.call(
+                    "text",
+                    _provider_request(model, contents, config),
+                    live=lambda: get_client().models.generate_content(
+                        model=model,
+                        contents=contents,
+                        config=_build_config(call.remaining(), config)
+                    ).text or "",
+                    fake=lambda: providers.fake_text(contents, config)
+                )
+            except (errors.APIError, httpx.TransportError) as e:
+                time.sleep(call.retry_delay(e))
+    finally:
+        limiter.release()
+
+
+async def agenerate(contents, model=None, timeout=None, cache=False, **config) -> str:
+    """Async variant of generate; waits for slots and backoff without blocking the event loop."""
+    model = model or DEFAULT_MODEL
+    if not cache:
+        return await _agenerate(contents, model, timeout, config)
+
+    key = _cache_key(model, contents, config)
+    text = await asyncio.to_thread(prompt_cache.get, key)
+    if text is None:
+        text = await _agenerate(contents, model, timeout, config)
+        if text:
+            await asyncio.to_thread(prompt_cache.put, key, text)
+    return text
+
+
+async def _agenerate(contents, model, timeout, config):
+    call = _Call(timeout)
+    _count("calls")
+
+    await limiter.acquire_async(call.remaining())
+    try:
+        while True:
+            await asyncio.sleep(bucket.reserve(call.remaining()))
+            async def live():
+                response = await get_client().aio.models.generate_content(
+                    model=model,
+                    contents=contents,
+                    config=_build_config(call.remaining(), config)
+                )
+                return response.text or ""
+
+            try:
+                return await providers.acall(
+                    "text",
+                    _provider_request(model, contents, config),
+                    live=live,
+                    fake=lambda: providers.fake_text(contents, config)
+                )
+            except (errors.APIError, httpx.TransportError) as e:
+                await asyncio.sleep(call.retry_delay(e))
+    finally:
+        limiter.release()
+
+
+def generate_stream(contents, model=None, timeout=None, **config):
+    """
+    Like generate, but yields the text piece by piece as Gemini produces it. Failures are
+    retried only until the first piece has been yielded; the slot is held until the
+    stream is exhausted or closed.
+    """
+    _ensure_off_event_loop("generate_stream")
+    model = model or DEFAULT_MODEL
+    call = _Call(timeout)
+    _count("calls")
+
+    limiter.acquire(call.remaining())
+    try:
+        while True:
+            time.sleep(bucket.reserve(call.remaining()))
+            started = False
+            try:
+                def live_pieces():
+                    return (
+                        chunk.text for chunk in get_client().models.generate_content_stream(
+                            model=model,
+                            contents=contents,
+                            config=_build_config(call.remaining(), config)
+                        )
+                    )
+
+                if providers.get_mode("text") == "live":
+                    pieces = live_pieces()
+                else:
+                    pieces = providers.split_stream(providers.call(
+                        "text",
+                        _provider_request(model, contents, config),
+                        live=lambda: "".join(piece or "" for piece in live_pieces()),
+                        fake=lambda: providers.fake_text(contents, config)
+                    ))
+
+                for piece in pieces:
+                    if piece:
+                        started = True
+                        yield piece
+                return
+            except (errors.APIError, httpx.TransportError) as e:
+                if started:
+                    _count("failures")
+                    raise LLMError(f"LLM stream failed: {e}") from e
+                time.sleep(call.retry_delay(e))
+    finally:
+        limiter.release()
+
+
+async def agenerate_stream(contents, model=None, timeout=None, **config):
+    """Async variant of generate_stream."""
+    model = model or DEFAULT_MODEL
+    call = _Call(timeout)
+    _count("calls")
+
+    await limiter.acquire_async(call.remaining())
+    try:
+        while True:
+            await asyncio.sleep(bucket.reserve(call.remaining()))
+            started = False
+            try:
+                async def live_chunks():
+                    return await get_client().aio.models.generate_content_stream(
+                        model=model,
+                        contents=contents,
+                        config=_build_config(call.remaining(), config)
+                    )
+
+                async def live_text():
+                    return "".join([chunk.text or "" async for chunk in await live_chunks()])
+
+                if providers.get_mode("text") != "live":
+                    text = await providers.acall(
+                        "text",
+                        _provider_request(model, contents, config),
+                        live=live_text,
+                        fake=lambda: providers.fake_text(contents, config)
+                    )
+                    for piece in providers.split_stream(text):
+                        started = True
+                        yield piece
+                    return
+
+                async for chunk in await live_chunks():
+                    if chunk.text:
+                        started = True
+                        yield chunk.text
+                return
+            except (errors.APIError, httpx.TransportError) as e:
+                if started:
+                    _count("failures")
+                    raise LLMError(f"LLM stream failed: {e}") from e
+                await asyncio.sleep(call.retry_delay(e))
+    finally:
+        limiter.release()
+
+
+def gateway_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update(limiter.stats())
+    stats["prompt_cache"] = prompt_cache.stats()
+    return stats
@@ -0,0 +1,186 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+METRICS_PREFIX = "studymate"
+# Upper bounds, in seconds, of the latency histogram buckets. Stages range from
+# milliseconds (chunking, a cached retrieval) to minutes (OCR of a long scan, a video).
+LATENCY_BUCKETS = tuple(
+    float(bound) for bound in os.environ.get(
+        "METRICS_LATENCY_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60,120,300"
+    ).split(",")
+)
+# Stats keys that only ever grow; they are exported as counters, everything else as gauges.
+COUNTER_KEYS = {"hits", "misses", "evictions", "calls", "retries", "failures", "timeouts"}
+
+# The request or job a stage belongs to: the route for API requests, set by the
+# middleware in main, and "/upload/" for ingestion jobs. Inherited by asyncio.to_thread.
+_pipeline = ContextVar("pipeline", default="other")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with a fixed set of label names."""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for label_values, counts in series:
+            labels = list(zip(self.label_names, label_values))
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(counts[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {counts[-1]}")
+        return lines
+
+
+stage_seconds = Histogram(
+    f"{METRICS_PREFIX}_stage_duration_seconds",
+    "Time spent in one pipeline stage (rasterize, ocr, chunk, embed, insert, retrieve, generate, tts, render, encode, ...).",
+    ("pipeline", "stage")
+)
+request_seconds = Histogram(
+    f"{METRICS_PREFIX}_http_request_duration_seconds",
+    "Time until the response starts, by route and status code.",
+    ("method", "route", "status")
+)
+
+_collectors = []
+
+
+@contextmanager
+def pipeline(name: str):
+    """Attributes the stages timed inside the block to the named pipeline."""
+    token = _pipeline.set(name)
+    try:
+        yield
+    finally:
+        _pipeline.reset(token)
+
+
+def observe_stage(stage: str, seconds: float):
+    stage_seconds.observe(seconds, _pipeline.get(), stage)
+
+
+@contextmanager
+def time_stage(stage: str):
+    """Records the wall time of the block, successful or not, as one stage observation."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+class Stopwatch:
+    """
+    Accumulates the time spent producing the items of an iterator, for stages that run
+    interleaved with others inside a generator pipeline.
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    def wrap(self, iterable):
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.seconds += time.perf_counter() - started
+            yield item
+
+
+def observe_request(method: str, route: str, status_code: int, seconds: float):
+    request_seconds.observe(seconds, method, route, str(status_code))
+
+
+def register_collector(name: str, collect, help_text: str, label: str = None):
+    """
+    Exports the numeric values of the dict returned by collect() at scrape time, as
+    <prefix>_<name>_<key>, or as one <prefix>_<name>{<label>="<key>"} series per key
+    when label is given. Nested dicts are flattened with underscores.
+    """
+    _collectors.append((f"{METRICS_PREFIX}_{name}", collect, help_text, label))
+
+
+def _flatten(stats, prefix=""):
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}_")
+        elif isinstance(value, (bool, int, float)):
+            yield f"{prefix}{key}", value
+
+
+def _render_collector(name, collect, help_text, label):
+    try:
+        stats = collect() or {}
+    except Exception as e:
+        print(f"Metrics collector {name} failed: {e}")
+        return []
+
+    if label:
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        lines.extend(f"{name}{_format_labels([(label, key)])} {_format_value(value)}" for key, value in _flatten(stats))
+        return lines
+
+    lines = []
+    for key, value in _flatten(stats):
+        is_counter = key.rsplit("_", 1)[-1] in COUNTER_KEYS
+        metric = f"{name}_{key}_total" if is_counter else f"{name}_{key}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {'counter' if is_counter else 'gauge'}")
+        lines.append(f"{metric} {_format_value(value)}")
+    return lines
+
+
+def render() -> str:
+    """
+    The Prometheus text exposition of every histogram and collector. Values are per
+    process; with several server workers each must be scraped separately.
+    """
+    lines = stage_seconds.render() + request_seconds.render()
+    for collector in _collectors:
+        lines.extend(_render_collector(*collector))
+    return "\n".join(lines) + "\n"
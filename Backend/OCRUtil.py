@@ -0,0 +1,184 @@
+import multiprocessing
+import os
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytesseract
+from pdf2image import convert_from_path, pdfinfo_from_path
+from pypdf import PdfReader
+from dotenv import load_dotenv
+
+import Metrics as metrics
+
+load_dotenv()
+
+TESSERACT_PATH = os.environ["TESSERACT_PATH"]
+POPPLER_PATH = os.environ["POPPLER_PATH"]
+# Size of the one OCR process pool shared by every ingestion job in the process.
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", os.cpu_count() or 1))
+# Pages whose text layer has fewer characters than this are treated as scans and OCR'd.
+MIN_TEXT_LAYER_CHARS = int(os.environ.get("MIN_TEXT_LAYER_CHARS", 25))
+# Number of pages held in flight at once; bounds peak memory for large scans.
+PAGE_WINDOW_SIZE = int(os.environ.get("PAGE_WINDOW_SIZE", 16))
+
+pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+
+_ocr_executor = None
+_ocr_executor_lock = threading.Lock()
+
+
+def get_ocr_executor():
+    """
+    Returns the process-wide OCR pool, creating it on first use. Workers are started
+    with forkserver (spawn where unavailable) rather than forked from the server, which
+    already holds the embedding model and many threads.
+    """
+    global _ocr_executor
+    with _ocr_executor_lock:
+        if _ocr_executor is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _ocr_executor = ProcessPoolExecutor(
+                max_workers=max(1, OCR_WORKERS),
+                mp_context=multiprocessing.get_context(method)
+            )
+        return _ocr_executor
+
+
+def _discard_ocr_executor(executor):
+    """Forgets a pool whose worker died so the next job starts a fresh one."""
+    global _ocr_executor
+    with _ocr_executor_lock:
+        if _ocr_executor is executor:
+            _ocr_executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _ocr_page(file_path, page_number, dpi):
+    """
+    Rasterizes and OCRs a single page and returns (text, rasterize_seconds, ocr_seconds).
+    Runs inside a worker process, so only the page number travels to the worker and
+    only the text and timings travel back.
+    """
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+    started = time.perf_counter()
+
+    images = convert_from_path(
+        file_path,
+        dpi=dpi,
+        first_page=page_number,
+        last_page=page_number,
+        poppler_path=POPPLER_PATH
+    )
+    rasterized = time.perf_counter()
+    text = "".join(pytesseract.image_to_string(image) for image in images)
+
+    return text, rasterized - started, time.perf_counter() - rasterized
+
+
+def _ocr_pages(executor, file_path, page_numbers, dpi):
+    """Runs _ocr_page over page_numbers, in the executor when one is given."""
+    if executor is None:
+        return [_ocr_page(file_path, page_number, dpi) for page_number in page_numbers]
+
+    return list(executor.map(
+        _ocr_page,
+        [file_path] * len(page_numbers),
+        page_numbers,
+        [dpi] * len(page_numbers)
+    ))
+
+
+def _record_ocr_timing(page_count, workers, elapsed, results):
+    # Worker processes cannot record metrics themselves, so their timings are recorded here.
+    for _, rasterize_seconds, ocr_seconds in results:
+        metrics.observe_stage("rasterize", rasterize_seconds)
+        metrics.observe_stage("ocr", ocr_seconds)
+
+    page_seconds = [rasterize_seconds + ocr_seconds for _, rasterize_seconds, ocr_seconds in results]
+    print(
+        f"OCR: {page_count} pages on {min(workers, page_count)} workers in {elapsed:.2f}s "
+        f"(avg {sum(page_seconds) / len(page_seconds):.2f}s/page, slowest {max(page_seconds):.2f}s)"
+    )
+
+
+def get_page_count(file_path):
+    """Returns the number of pages in the PDF using poppler's pdfinfo."""
+    info = pdfinfo_from_path(file_path, poppler_path=POPPLER_PATH)
+    return int(info["Pages"])
+
+
+def open_text_layer(file_path):
+    """Returns a PdfReader for the file, or None if pypdf cannot parse it."""
+    try:
+        return PdfReader(file_path)
+    except Exception as e:
+        print(f"Text layer unavailable, falling back to OCR: {e}")
+        return None
+
+
+def extract_page_text(reader, page_number):
+    """Returns the embedded text of a 1-based page, or None if it cannot be read."""
+    if reader is None:
+        return None
+    try:
+        return reader.pages[page_number - 1].extract_text() or ""
+    except Exception:
+        return None
+
+
+def needs_ocr(text):
+    return text is None or len(text.strip()) < MIN_TEXT_LAYER_CHARS
+
+
+def iter_pdf_pages(file_path, dpi=300, workers=None, window_size=None, progress_callback=None):
+    """
+    Yields the text of every page in order, processing window_size pages at a time
+    so that at most one window of rasterized pages exists at once. Pages with a
+    usable embedded text layer are read directly; only the rest are OCR'd, in this
+    process when workers is 1 and on the shared pool of OCR_WORKERS processes otherwise.
+    progress_callback, if given, is called as progress_callback(pages_done, page_count).
+    """
+    file_path = urllib.parse.unquote(file_path)
+    workers = max(1, workers or OCR_WORKERS)
+    window_size = max(1, window_size or PAGE_WINDOW_SIZE)
+
+    reader = open_text_layer(file_path)
+    page_count = len(reader.pages) if reader is not None else get_page_count(file_path)
+
+    ocr_page_total = 0
+    for window_start in range(1, page_count + 1, window_size):
+        window = range(window_start, min(window_start + window_size, page_count + 1))
+        with metrics.time_stage("extract"):
+            page_texts = {page_number: extract_page_text(reader, page_number) for page_number in window}
+        scanned_pages = [page_number for page_number in window if needs_ocr(page_texts[page_number])]
+
+        if scanned_pages:
+            executor = get_ocr_executor() if workers > 1 else None
+
+            started = time.perf_counter()
+            try:
+                results = _ocr_pages(executor, file_path, scanned_pages, dpi)
+            except BrokenProcessPool:
+                _discard_ocr_executor(executor)
+                raise
+            pool_size = max(1, OCR_WORKERS) if executor is not None else 1
+            _record_ocr_timing(len(scanned_pages), pool_size, time.perf_counter() - started, results)
+
+            for page_number, (text, _, _) in zip(scanned_pages, results):
+                page_texts[page_number] = text
+            ocr_page_total += len(scanned_pages)
+
+        for page_number in window:
+            yield page_texts[page_number]
+            if progress_callback:
+                progress_callback(page_number, page_count)
+
+    print(f"Text layer: {page_count - ocr_page_total} of {page_count} pages, OCR needed for {ocr_page_total}")
+
+
+def read_pdf_pages(file_path, dpi=300, workers=None):
+    """Returns the text of every page in order. See iter_pdf_pages."""
+    return list(iter_pdf_pages(file_path, dpi=dpi, workers=workers))
@@ -1,30 +1,26 @@
 import os
 from dotenv import load_dotenv
-import pytesseract
 import faiss
-from pdf2image import convert_from_path
-from sentence_transformers import SentenceTransformer
+import numpy as np
 import urllib.parse
-import google.generativeai as genai
 
+import LLMGateway as llm
+import Metrics as metrics
+from OCRUtil import read_pdf_pages, iter_pdf_pages
+from EmbeddingModel import encode_documents, encode_query
 
-load_dotenv()
 
-gemini_api_key = os.environ["GEMINI_API_KEY"]
-pytesseract.pytesseract.tesseract_cmd = os.environ["TESSERACT_PATH"]
-poppler_path = os.environ["POPPLER_PATH"]
+load_dotenv()
 
-genai.configure(api_key=gemini_api_key)
-model_gen = genai.GenerativeModel("gemini-2.5-flash")
-model_embed = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+GEMINI_MODEL_NAME = "gemini-2.5-flash"
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", 64))
 
 
-def read_scanned_pdf(file_path, dpi=300):
-    """Extract text from a scanned PDF using Tesseract OCR."""
+def read_scanned_pdf(file_path, dpi=300, workers=None):
+    """Extract text from a PDF, using the embedded text layer where present and Tesseract OCR otherwise."""
     try:
         file_path = urllib.parse.unquote(file_path)
-        pages = convert_from_path(file_path, dpi=dpi, poppler_path=poppler_path)
-        text = "".join(pytesseract.image_to_string(page) for page in pages)
+        text = "\n".join(read_pdf_pages(file_path, dpi=dpi, workers=workers))
         return text.strip()
     except Exception as e:
         return f"Error reading scanned PDF: {e}"
@@ -40,9 +36,52 @@ def chunk_text(text, chunk_size=500, overlap=50):
         start += chunk_size - overlap
     return chunks
 
+def iter_chunks(texts, chunk_size=500, overlap=50):
+    """
+    Streaming equivalent of chunk_text over a sequence of texts (e.g. pages):
+    yields the same chunks while only buffering about one chunk of words.
+    """
+    step = chunk_size - overlap
+    words = []
+    for text in texts:
+        words.extend(text.split())
+        while len(words) >= chunk_size:
+            yield " ".join(words[:chunk_size])
+            words = words[step:]
+
+    while words:
+        yield " ".join(words[:chunk_size])
+        words = words[step:]
+
 def embed_chunks(chunks):
     """Generate embeddings for text chunks."""
-    return model_embed.encode(chunks, convert_to_numpy=True, normalize_embeddings=True).astype("float32")
+    with metrics.time_stage("embed"):
+        return encode_documents(chunks)
+
+def stream_embedded_chunks(file_path, chunk_size=500, overlap=50, batch_size=None, dpi=300, workers=None,
+                           progress_callback=None):
+    """
+    Reads, chunks and embeds a PDF incrementally, yielding (start_index, chunks, vectors)
+    batches so peak memory depends on the page window and batch size, not the document size.
+    """
+    file_path = urllib.parse.unquote(file_path)
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    # Chunking pulls pages on demand, so its own time is the time spent producing
+    # chunks minus the time spent producing (extracting or OCRing) the pages.
+    page_clock, chunk_clock = metrics.Stopwatch(), metrics.Stopwatch()
+    pages = page_clock.wrap(iter_pdf_pages(file_path, dpi=dpi, workers=workers, progress_callback=progress_callback))
+
+    start_index, batch = 0, []
+    for chunk in chunk_clock.wrap(iter_chunks(pages, chunk_size=chunk_size, overlap=overlap)):
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            yield start_index, batch, embed_chunks(batch)
+            start_index, batch = start_index + len(batch), []
+
+    metrics.observe_stage("chunk", chunk_clock.seconds - page_clock.seconds)
+
+    if batch:
+        yield start_index, batch, embed_chunks(batch)
 
 def build_faiss_index(vectors):
     """Build a FAISS index from embedded vectors."""
@@ -52,18 +91,35 @@ def build_faiss_index(vectors):
     return index
 
 def search_index(query, index, chunks, k=3):
-    """Search for the top-k relevant chunks in the FAISS index."""
-    query_vec = model_embed.encode([query], convert_to_numpy=True, normalize_embeddings=True).astype("float32")
-    distances, indices = index.search(query_vec, k)
-    return [(chunks[i], float(distances[0][j])) for j, i in enumerate(indices[0])]
+    """
+    Search for the top-k relevant chunks in the FAISS index. query is either the question
+    text or its already computed embedding.
+    """
+    if index.ntotal == 0:
+        return []
+    query_vec = encode_query(query) if isinstance(query, str) else np.asarray(query, dtype="float32")
+    distances, indices = index.search(query_vec.reshape(1, -1), min(k, index.ntotal))
+    return [(chunks[i], float(distances[0][j])) for j, i in enumerate(indices[0]) if i >= 0]
+
+def format_history(history_list, summary=None):
+    """
+    Format the conversation history: the running summary of earlier turns, if any,
+    followed by the recent messages ("Sender: message" lines).
+    """
+    if isinstance(history_list, str):
+        history_list = history_list.splitlines()
 
-def format_history(history_list):
-    """Format the recent chat history."""
-    return "\n".join(history_list[-5:]) if history_list else "No prior conversation history."
+    sections = []
+    if summary:
+        sections.append(f"Summary of earlier conversation:\n{summary}")
+    if history_list:
+        sections.append("\n".join(history_list))
 
-def generate_response(question, context, history):
-    """Generate Gemini response using context and conversation history."""
-    history_text = format_history(history)
+    return "\n\n".join(sections) if sections else "No prior conversation history."
+
+def build_response_prompt(question, context, history, summary=None):
+    """Build the RAG prompt from the question, retrieved context and conversation history."""
+    history_text = format_history(history, summary)
 
     prompt = f"""
     You are a helpful assistant. Use the provided context AND the conversation history 
@@ -81,8 +137,24 @@ def generate_response(question, context, history):
     {question}
     """
 
-    response = model_gen.generate_content(prompt)
-    return response.text
+    return prompt
+
+def generate_response(question, context, history, summary=None):
+    """Generate Gemini response using context and conversation history."""
+    return llm.generate(build_response_prompt(question, context, history, summary), model=GEMINI_MODEL_NAME)
+
+async def agenerate_response(question, context, history, summary=None):
+    """Async variant of generate_response for the API handlers."""
+    return await llm.agenerate(build_response_prompt(question, context, history, summary), model=GEMINI_MODEL_NAME)
+
+def stream_response(question, context, history, summary=None):
+    """Like generate_response, but yields the answer text piece by piece as Gemini produces it."""
+    yield from llm.generate_stream(build_response_prompt(question, context, history, summary), model=GEMINI_MODEL_NAME)
+
+async def astream_response(question, context, history, summary=None):
+    """Async variant of stream_response."""
+    async for piece in llm.agenerate_stream(build_response_prompt(question, context, history, summary), model=GEMINI_MODEL_NAME):
+        yield piece
 
 def generate_session_name(doc_name):
 
@@ -98,5 +170,4 @@ def generate_session_name(doc_name):
 
     """
 
-    response = model_gen.generate_content(prompt)
-    return response.text
+    return llm.generate(prompt, model=GEMINI_MODEL_NAME)
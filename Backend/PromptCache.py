@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+PROMPT_CACHE_DIR = os.environ.get(
+    "PROMPT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".prompt_cache")
+)
+# Total size of cached responses on disk before the least recently used are evicted.
+PROMPT_CACHE_MAX_MB = float(os.environ.get("PROMPT_CACHE_MAX_MB", 512))
+
+
+def json_default(value):
+    # Response schemas are pydantic models; key them by their JSON schema.
+    if hasattr(value, "model_json_schema"):
+        return value.model_json_schema()
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return repr(value)
+
+
+def prompt_key(model, contents, config) -> str:
+    """
+    Content address of a generation request: the SHA-256 of the model, the prompt and
+    every generation setting (system instruction, temperature, response schema, ...).
+    """
+    payload = json.dumps(
+        {"model": model, "contents": contents, "config": config},
+        sort_keys=True,
+        default=json_default,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PromptCache:
+    """
+    Persistent cache of LLM responses, one file per request under directory, evicted
+    least recently used first once the files exceed max_bytes. Files are written
+    atomically, so concurrent workers can share the directory.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index = None  # key -> size in bytes, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _load_index_locked(self):
+        if self._index is not None:
+            return
+
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name[:-len(".json")], stat.st_size))
+
+        self._index = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self._bytes = sum(self._index.values())
+
+    def _evict_locked(self):
+        while self._bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def get(self, key):
+        """Returns the cached response text for key, or None."""
+        path = self._path(key)
+        with self._lock:
+            self._load_index_locked()
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    text = json.load(f)["text"]
+                os.utime(path)
+            except (OSError, ValueError, KeyError):
+                self.misses += 1
+                self._bytes -= self._index.pop(key, 0)
+                return None
+
+            self.hits += 1
+            if key in self._index:
+                self._index.move_to_end(key)
+            return text
+
+    def put(self, key, text):
+        path = self._path(key)
+        data = json.dumps({"text": text}, ensure_ascii=False).encode("utf-8")
+
+        with self._lock:
+            self._load_index_locked()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+
+            self._bytes += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._evict_locked()
+
+    def clear(self):
+        with self._lock:
+            self._load_index_locked()
+            self.max_bytes, max_bytes = 0, self.max_bytes
+            self._evict_locked()
+            self.max_bytes = max_bytes
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._index) if self._index is not None else None,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+            }
+
+
+prompt_cache = PromptCache(PROMPT_CACHE_DIR, max_bytes=int(PROMPT_CACHE_MAX_MB * 2**20))
@@ -0,0 +1,250 @@
+import asyncio
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import threading
+import time
+
+from PIL import Image, ImageDraw
+
+from PromptCache import json_default
+
+# live: call the vendor. fake: synthesize a deterministic response locally.
+# record: call the vendor and save the response. replay: serve saved responses.
+PROVIDER_MODES = ("live", "fake", "record", "replay")
+PROVIDER_KINDS = ("text", "tts", "gtts", "image")
+
+PROVIDER_MODE = os.environ.get("PROVIDER_MODE", "live")
+PROVIDER_RECORDINGS_DIR = os.environ.get(
+    "PROVIDER_RECORDINGS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "provider_recordings")
+)
+# What replay does for a request that was never recorded: "fake" or "error".
+PROVIDER_REPLAY_MISS = os.environ.get("PROVIDER_REPLAY_MISS", "fake")
+# Seed for the simulated latencies; fake responses themselves depend only on the request.
+PROVIDER_SEED = os.environ.get("PROVIDER_SEED")
+PROVIDER_FAKE_TEXT_WORDS = int(os.environ.get("PROVIDER_FAKE_TEXT_WORDS", 150))
+# Speaking rate used to size fake narration.
+FAKE_SPEECH_WORDS_PER_SECOND = 2.5
+
+# Latency added to fake and replayed calls, e.g. "none", "fixed:0.2", "uniform:0.1,0.4",
+# "normal:0.8,0.2" or "lognormal:0.8,0.5" (median, sigma). PROVIDER_LATENCY_<KIND> overrides.
+DEFAULT_LATENCY = {"text": "lognormal:1.2,0.4", "tts": "lognormal:0.6,0.3", "gtts": "lognormal:0.8,0.3", "image": "lognormal:2.5,0.3"}
+
+# A silent MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, mono. Each decodes to 1152 samples.
+SILENT_MP3_FRAME = bytes([0xFF, 0xFB, 0x90, 0xC4]) + bytes(417 - 4)
+MP3_FRAME_SECONDS = 1152 / 44100
+
+
+class ProviderReplayMiss(Exception):
+    """Replay mode found no recording for the request."""
+
+
+_rng = random.Random(PROVIDER_SEED)
+_rng_lock = threading.Lock()
+_recording_lock = threading.Lock()
+
+
+def get_mode(kind: str) -> str:
+    mode = os.environ.get(f"PROVIDER_MODE_{kind.upper()}", PROVIDER_MODE)
+    if mode not in PROVIDER_MODES:
+        raise ValueError(f"Unknown provider mode {mode!r}; expected one of {', '.join(PROVIDER_MODES)}.")
+    return mode
+
+
+def parse_latency(spec: str):
+    """Returns a function that draws one latency in seconds from the distribution spec."""
+    name, _, args = spec.partition(":")
+    params = [float(arg) for arg in args.split(",") if arg]
+
+    if name in ("", "none"):
+        return lambda rng: 0.0
+    if name == "fixed":
+        return lambda rng: params[0]
+    if name == "uniform":
+        return lambda rng: rng.uniform(params[0], params[1])
+    if name == "normal":
+        return lambda rng: max(0.0, rng.gauss(params[0], params[1]))
+    if name == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(params[0]), params[1])
+    raise ValueError(f"Unknown latency distribution {spec!r}.")
+
+
+def sample_latency(kind: str) -> float:
+    draw = parse_latency(os.environ.get(f"PROVIDER_LATENCY_{kind.upper()}", DEFAULT_LATENCY[kind]))
+    with _rng_lock:
+        return draw(_rng)
+
+
+def request_key(kind: str, request) -> str:
+    payload = json.dumps({"kind": kind, "request": request}, sort_keys=True, default=json_default, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _recording_path(kind, key):
+    return os.path.join(PROVIDER_RECORDINGS_DIR, kind, f"{key}.bin")
+
+
+def save_recording(kind: str, request, result):
+    """Stores a live response (str or bytes) under the request's key."""
+    path = _recording_path(kind, request_key(kind, request))
+    data = result.encode("utf-8") if isinstance(result, str) else result
+    with _recording_lock:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+
+
+def load_recording(kind: str, request):
+    """Returns the recorded response for the request (str for text, bytes otherwise), or None."""
+    try:
+        with open(_recording_path(kind, request_key(kind, request)), "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    return data.decode("utf-8") if kind == "text" else data
+
+
+def _replay(kind, request, fake):
+    result = load_recording(kind, request)
+    if result is not None:
+        return result
+    if PROVIDER_REPLAY_MISS == "error":
+        raise ProviderReplayMiss(f"No {kind} recording for request {request_key(kind, request)}.")
+    return fake()
+
+
+def call(kind: str, request, live, fake):
+    """
+    Runs one provider request in the configured mode. request is the JSON-serializable
+    description used to address recordings, live() performs the vendor call and fake()
+    builds the local stand-in; both return str (text) or bytes (audio, images).
+    """
+    mode = get_mode(kind)
+    if mode == "live":
+        return live()
+    if mode == "record":
+        result = live()
+        if result is not None:
+            save_recording(kind, request, result)
+        return result
+
+    time.sleep(sample_latency(kind))
+    return fake() if mode == "fake" else _replay(kind, request, fake)
+
+
+async def acall(kind: str, request, live, fake):
+    """Async variant of call; live is a coroutine function."""
+    mode = get_mode(kind)
+    if mode == "live":
+        return await live()
+    if mode == "record":
+        result = await live()
+        if result is not None:
+            await asyncio.to_thread(save_recording, kind, request, result)
+        return result
+
+    await asyncio.sleep(sample_latency(kind))
+    return fake() if mode == "fake" else _replay(kind, request, fake)
+
+
+def _seeded(key: str) -> random.Random:
+    return random.Random(int(key[:16], 16))
+
+
+def _fake_words(rng, vocabulary, count):
+    return " ".join(rng.choice(vocabulary) for _ in range(count))
+
+
+def _vocabulary(contents):
+    words = [word.strip(".,:;!?\"'()[]{}*#") for word in str(contents).split()]
+    words = [word for word in words if word.isalpha() and len(word) > 3]
+    return words or ["study", "notes", "concept", "example", "definition"]
+
+
+def _fake_from_schema(schema, defs, rng, vocabulary):
+    """Builds a value matching a (pydantic-generated) JSON schema."""
+    if "$ref" in schema:
+        return _fake_from_schema(defs[schema["$ref"].split("/")[-1]], defs, rng, vocabulary)
+
+    kind = schema.get("type")
+    if kind == "object":
+        return {
+            name: _fake_from_schema(prop, defs, rng, vocabulary)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        count = max(schema.get("minItems", 0), 5)
+        return [_fake_from_schema(schema.get("items", {}), defs, rng, vocabulary) for _ in range(count)]
+    if kind == "integer":
+        return rng.randint(1, 10)
+    if kind == "number":
+        return round(rng.uniform(0, 10), 2)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    return _fake_words(rng, vocabulary, 12).capitalize() + "."
+
+
+def _fake_video_frames(rng, vocabulary):
+    frames = [
+        {
+            "text": f"{_fake_words(rng, vocabulary, 2).title()}:\n- {_fake_words(rng, vocabulary, 2)}\n- {_fake_words(rng, vocabulary, 2)}",
+            "narration": _fake_words(rng, vocabulary, 30).capitalize() + ".",
+            "img_prompt": f"An illustration of {_fake_words(rng, vocabulary, 4)}."
+        }
+        for _ in range(3)
+    ]
+    return ",\n".join(json.dumps(frame) for frame in frames)
+
+
+def fake_text(contents, config) -> str:
+    """
+    Deterministic stand-in for a Gemini response. JSON-schema requests get a conforming
+    document, the video-script prompt gets slide frames, anything else gets prose built
+    from the prompt's own words.
+    """
+    key = request_key("text", {"contents": contents, "config": config})
+    rng = _seeded(key)
+    vocabulary = _vocabulary(contents)
+
+    schema = config.get("response_schema")
+    if schema is not None:
+        schema = schema.model_json_schema() if hasattr(schema, "model_json_schema") else schema
+        return json.dumps(_fake_from_schema(schema, schema.get("$defs", {}), rng, vocabulary))
+
+    if '"img_prompt"' in str(contents):
+        return _fake_video_frames(rng, vocabulary)
+
+    sentences, remaining = [], PROVIDER_FAKE_TEXT_WORDS
+    while remaining > 0:
+        length = min(remaining, rng.randint(8, 18))
+        sentences.append(_fake_words(rng, vocabulary, length).capitalize() + ".")
+        remaining -= length
+    return " ".join(sentences)
+
+
+def split_stream(text: str, words_per_piece: int = 4):
+    """Splits text into the pieces a streamed response would arrive in."""
+    words = text.split(" ")
+    return [" ".join(words[i:i + words_per_piece]) + (" " if i + words_per_piece < len(words) else "")
+            for i in range(0, len(words), words_per_piece)]
+
+
+def fake_mp3(text: str) -> bytes:
+    """Silent MP3 as long as text would take to read aloud."""
+    seconds = max(1.0, len(text.split()) / FAKE_SPEECH_WORDS_PER_SECOND)
+    return SILENT_MP3_FRAME * math.ceil(seconds / MP3_FRAME_SECONDS)
+
+
+def fake_png(prompt: str, size=(1024, 1024)) -> bytes:
+    """PNG with a colour derived from the prompt and the prompt written on it."""
+    rng = _seeded(request_key("image", prompt))
+    image = Image.new("RGB", size, tuple(rng.randint(64, 224) for _ in range(3)))
+    ImageDraw.Draw(image).multiline_text((40, 40), "\n".join(prompt[i:i + 40] for i in range(0, min(len(prompt), 200), 40)), fill=(20, 20, 20))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
@@ -1,30 +1,21 @@
-import os
-import pytesseract
 import faiss
-import google.generativeai as genai
-from sentence_transformers import SentenceTransformer
 import urllib.parse
-from pdf2image import convert_from_path
 
-api_key = os.environ["GEMINI_API_KEY"]
-pytesseract.pytesseract.tesseract_cmd = os.environ["TESSERACT_PATH"]
-model_embed = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2") # Renamed for clarity
+import LLMGateway as llm
 
-genai.configure(api_key=api_key)
-model_gen = genai.GenerativeModel(model_name="gemini-2.5-flash") # Renamed for clarity
+from OCRUtil import read_pdf_pages
+from EmbeddingModel import encode_documents, encode_query
+
+GEMINI_MODEL_NAME = "gemini-2.5-flash"
 
 conversation_history = []
 
 def read_scanned_pdf(file_path, dpi=300):
     try:
         file_path = urllib.parse.unquote(file_path)
-        poppler_path = os.environ["POPPLER_PATH"]
-
-        pages = convert_from_path(file_path, dpi=dpi, poppler_path=poppler_path)
 
         text = ""
-        for page in pages:
-            page_text = pytesseract.image_to_string(page)
+        for page_text in read_pdf_pages(file_path, dpi=dpi):
             text += f"\n{page_text}"
 
         return text.strip()
@@ -46,7 +37,7 @@ def chunk_text(text, chunk_size=500, overlap=50):
 
 
 def embed_chunks(chunks):
-    return model_embed.encode(chunks, convert_to_numpy=True, normalize_embeddings=True).astype("float32")
+    return encode_documents(chunks)
 
 def build_faiss_index(vectors):
     dimension = vectors.shape[1]
@@ -55,7 +46,7 @@ def build_faiss_index(vectors):
     return index
 
 def search_index(query, index, chunks, k=3):
-    query_vec = model_embed.encode([query], convert_to_numpy=True, normalize_embeddings=True).astype("float32")
+    query_vec = encode_query(query).reshape(1, -1)
     distances, indices = index.search(query_vec, k)
     results = [(chunks[i], float(distances[0][j])) for j, i in enumerate(indices[0])]
     return results
@@ -108,8 +99,7 @@ if __name__ == "__main__":
             {question}
             """
 
-        response = model_gen.generate_content(prompt)
-        bot_response = response.text
+        bot_response = llm.generate(prompt, model=GEMINI_MODEL_NAME)
 
         conversation_history.append(f"User: {question}")
         conversation_history.append(f"Bot: {bot_response}")
@@ -0,0 +1,49 @@
+import os
+import threading
+from typing import List
+
+from Retrieval import RetrievedChunk
+
+RERANK_MODEL_NAME = os.environ.get("RERANK_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Whether /ask/ reranks when the request does not say.
+RERANK_ENABLED = os.environ.get("RERANK_ENABLED", "false").lower() in ("1", "true", "yes")
+# Candidates retrieved for reranking before the final k are kept.
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", 20))
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_reranker():
+    """Returns the process-wide CrossEncoder, loading it on first use."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import CrossEncoder
+
+                print(f"Loading rerank model {RERANK_MODEL_NAME}...")
+                _model = CrossEncoder(RERANK_MODEL_NAME)
+    return _model
+
+
+def candidate_count(k: int) -> int:
+    """Number of chunks to retrieve so that reranking can choose the best k."""
+    return max(k, RERANK_CANDIDATES)
+
+
+def rerank_chunks(question: str, chunks: List[RetrievedChunk], k: int) -> List[RetrievedChunk]:
+    """
+    Scores every (question, chunk) pair with the cross-encoder in a single batch and
+    returns the k best chunks, most relevant first.
+    """
+    if len(chunks) <= 1:
+        return chunks[:k]
+
+    scores = get_reranker().predict(
+        [(question, chunk.chunk_text or "") for chunk in chunks],
+        batch_size=len(chunks),
+        show_progress_bar=False
+    )
+    ranked = sorted(zip(scores, range(len(chunks))), key=lambda pair: pair[0], reverse=True)
+    return [chunks[i] for _, i in ranked[:k]]
@@ -0,0 +1,148 @@
+import os
+from typing import List, NamedTuple, Optional
+
+RETRIEVAL_MODES = ("vector", "hybrid")
+# Mode used when a caller does not pick one.
+DEFAULT_RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "vector")
+# Candidates taken from each ranking before fusion, as a multiple of k.
+HYBRID_CANDIDATE_FACTOR = int(os.environ.get("HYBRID_CANDIDATE_FACTOR", 4))
+HYBRID_MIN_CANDIDATES = int(os.environ.get("HYBRID_MIN_CANDIDATES", 20))
+# Reciprocal-rank-fusion constant: a chunk scores 1 / (RRF_K + rank) in each ranking it appears in.
+RRF_K = int(os.environ.get("RRF_K", 60))
+# HNSW candidate list size; raised to at least 2 * the rows a query ranks so large-k queries still fill up.
+HNSW_EF_SEARCH = int(os.environ.get("HNSW_EF_SEARCH", 100))
+
+
+class RetrievedChunk(NamedTuple):
+    embed_id: int
+    document_id: int
+    chunk_index: int
+    chunk_text: str
+    embedding: Optional[object] = None
+
+
+# Session scoping is applied as a semi-join on document_id so the planner can use either
+# the HNSW index (with pgvector 0.8+ iterative scans refilling filtered-out results) or the
+# document_id btree followed by an exact sort, whichever is cheaper for the session's size.
+# The vectors are returned too, for callers that diversify the results.
+SESSION_SEARCH_SQL = """
+    SELECT e.embed_id, e.document_id, e.chunk_index, e.chunk_text, e.embedding
+    FROM embeddings e
+    WHERE e.document_id IN (
+        SELECT scd.document_id FROM session_chunk_documents scd WHERE scd.session_id = %s
+    )
+    ORDER BY e.embedding <=> %s::vector
+    LIMIT %s;
+"""
+
+
+# Vector and full-text rankings of the session's chunks fused by reciprocal rank, in one
+# statement. The text query ORs the question's lexemes so a chunk does not need every word
+# to match; ts_rank_cd still ranks chunks covering more of them first. A question with no
+# searchable terms leaves the lexical ranking empty and the result is the vector ranking.
+HYBRID_SEARCH_SQL = """
+    WITH vector_ranked AS (
+        SELECT e.embed_id,
+               ROW_NUMBER() OVER (ORDER BY e.embedding <=> %(query_vector)s::vector) AS rank
+        FROM embeddings e
+        WHERE e.document_id IN (SELECT scd.document_id FROM session_chunk_documents scd WHERE scd.session_id = %(session_id)s)
+        ORDER BY e.embedding <=> %(query_vector)s::vector
+        LIMIT %(candidates)s
+    ),
+    text_query AS (
+        SELECT replace(plainto_tsquery('english', %(query_text)s)::text, ' & ', ' | ')::tsquery AS query
+    ),
+    lexical_ranked AS (
+        SELECT e.embed_id,
+               ROW_NUMBER() OVER (ORDER BY ts_rank_cd(e.chunk_tsv, q.query) DESC, e.embed_id) AS rank
+        FROM embeddings e
+        CROSS JOIN text_query q
+        WHERE e.document_id IN (SELECT scd.document_id FROM session_chunk_documents scd WHERE scd.session_id = %(session_id)s)
+          AND e.chunk_tsv @@ q.query
+        ORDER BY rank
+        LIMIT %(candidates)s
+    ),
+    fused AS (
+        SELECT COALESCE(v.embed_id, l.embed_id) AS embed_id,
+               COALESCE(1.0 / (%(rrf_k)s + v.rank), 0) + COALESCE(1.0 / (%(rrf_k)s + l.rank), 0) AS score
+        FROM vector_ranked v
+        FULL OUTER JOIN lexical_ranked l ON l.embed_id = v.embed_id
+    )
+    SELECT e.embed_id, e.document_id, e.chunk_index, e.chunk_text, e.embedding
+    FROM fused f
+    JOIN embeddings e ON e.embed_id = f.embed_id
+    ORDER BY f.score DESC, f.embed_id
+    LIMIT %(k)s;
+"""
+
+
+ANN_SETTINGS_SQL = """
+    SELECT set_config('hnsw.ef_search', %s, true),
+           set_config('hnsw.iterative_scan', 'strict_order', true);
+"""
+
+
+def _ef_search(ranked: int) -> str:
+    return str(max(HNSW_EF_SEARCH, 2 * ranked))
+
+
+def resolve_retrieval_mode(mode: Optional[str]) -> str:
+    """Returns mode, or the default when it is None; rejects unknown modes."""
+    mode = mode or DEFAULT_RETRIEVAL_MODE
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode {mode!r}; expected one of {', '.join(RETRIEVAL_MODES)}.")
+    return mode
+
+
+def _search_query(session_id: int, query_vector, k: int, mode: Optional[str], query_text: Optional[str]):
+    """
+    Returns the (sql, params, ranked) triple for the requested retrieval mode, where
+    ranked is the number of rows the vector ranking has to produce.
+    """
+    mode = resolve_retrieval_mode(mode)
+
+    if mode == "vector" or not query_text:
+        return SESSION_SEARCH_SQL, (session_id, query_vector, k), k
+
+    candidates = max(k * HYBRID_CANDIDATE_FACTOR, HYBRID_MIN_CANDIDATES)
+    return HYBRID_SEARCH_SQL, {
+        "query_vector": query_vector,
+        "query_text": query_text,
+        "session_id": session_id,
+        "candidates": candidates,
+        "rrf_k": RRF_K,
+        "k": k,
+    }, candidates
+
+
+def search_session_chunks(cur, session_id: int, query_vector, k: int,
+                          mode: Optional[str] = None, query_text: Optional[str] = None) -> List[RetrievedChunk]:
+    """
+    Returns the top k chunks of the session's documents for the query. mode "vector" ranks
+    by cosine distance to query_vector; "hybrid" fuses that ranking with a full-text match
+    of query_text. Defaults to DEFAULT_RETRIEVAL_MODE.
+    """
+    sql, params, ranked = _search_query(session_id, query_vector, k, mode, query_text)
+    cur.execute(ANN_SETTINGS_SQL, (_ef_search(ranked),))
+    cur.execute(sql, params)
+    return [RetrievedChunk(*row) for row in cur.fetchall()]
+
+
+async def search_session_chunks_async(cur, session_id: int, query_vector, k: int,
+                                      mode: Optional[str] = None, query_text: Optional[str] = None) -> List[RetrievedChunk]:
+    """Async variant of search_session_chunks for get_async_cursor cursors."""
+    sql, params, ranked = _search_query(session_id, query_vector, k, mode, query_text)
+    await cur.execute(ANN_SETTINGS_SQL, (_ef_search(ranked),))
+    await cur.execute(sql, params)
+    return [RetrievedChunk(*row) for row in await cur.fetchall()]
+
+
+async def get_session_document_ids_async(cur, session_id: int) -> List[int]:
+    """Returns the ids of the documents holding the chunks of the session's uploads."""
+    await cur.execute("SELECT document_id FROM session_chunk_documents WHERE session_id = %s;", (session_id,))
+    return [row[0] for row in await cur.fetchall()]
+
+
+def join_chunks(chunks: List[RetrievedChunk]) -> str:
+    """Joins retrieved chunks into the context block passed to the LLM."""
+    return "\n\n---\n\n".join(chunk.chunk_text for chunk in chunks if chunk.chunk_text)
@@ -1,21 +1,19 @@
-import google.generativeai as genai
 import psycopg2
 import fitz
 import io
 import json
 import re
 
+import LLMGateway as llm
+import Metrics as metrics
 from dbconnect import get_cursor
 
-import os
 from dotenv import load_dotenv
 
 # Load environment variables from .env
 load_dotenv()
 
-gemini_api_key = os.environ["GEMINI_API_KEY"]
-
-genai.configure(api_key=gemini_api_key)
+GEMINI_MODEL_NAME = "gemini-2.5-flash"
 
 
 
@@ -33,8 +31,9 @@ def fetch_and_summarize_pdfs(session_id):
         cur.execute("""
             SELECT e.chunk_text
             FROM embeddings e
-            JOIN sessiondocuments s ON s.document_id = e.document_id
-            WHERE s.session_id = %s;
+            JOIN session_chunk_documents s ON s.document_id = e.document_id
+            WHERE s.session_id = %s
+            ORDER BY s.document_id, e.chunk_index;
         """, (session_id,))
         rows = cur.fetchall()
 
@@ -52,8 +51,6 @@ def fetch_and_summarize_pdfs(session_id):
     if not all_text.strip():
         all_text = "No readable text extracted from the PDFs."
 
-    model = genai.GenerativeModel("gemini-2.5-flash")
-
     prompt = f"""
         You are an expert educational content creator.
 
@@ -88,8 +85,9 @@ def fetch_and_summarize_pdfs(session_id):
 
 
 
-    response = model.generate_content(prompt)
-    summary = response.text
+    # Unchanged session text yields the same prompt, so a regenerated video reuses the summary.
+    with metrics.time_stage("generate"):
+        summary = llm.generate(prompt, model=GEMINI_MODEL_NAME, cache=True)
 
     
     # 4. Return summary text
@@ -103,8 +101,6 @@ def fetch_and_summarize_pdfs(session_id):
 
 def summarize_and_generate_script(pdf_text):
     """Use Google Gemini to summarize and write a video script"""
-    model = genai.GenerativeModel("gemini-2.5-flash")
-
     prompt = f"""
         You are an expert educational content creator.
 
@@ -146,8 +142,8 @@ def summarize_and_generate_script(pdf_text):
 
 
 
-    response = model.generate_content(prompt)
-    response_text = response.text
+    with metrics.time_stage("generate"):
+        response_text = llm.generate(prompt, model=GEMINI_MODEL_NAME)
 
    
     raw_text = response_text.strip()
@@ -0,0 +1,201 @@
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from EmbeddingModel import EMBED_DIMENSION
+from PDFUtil import build_faiss_index, search_index
+from Retrieval import RetrievedChunk
+from dbconnect import get_cursor
+
+# Total memory the cached indexes (vectors plus chunk text) may use before LRU eviction.
+FAISS_CACHE_MAX_MB = float(os.environ.get("FAISS_CACHE_MAX_MB", 256))
+
+SESSION_VECTORS_SQL = """
+    SELECT e.embed_id, e.document_id, e.chunk_index, e.chunk_text, e.embedding
+    FROM session_chunk_documents scd
+    JOIN embeddings e ON e.document_id = scd.document_id
+    WHERE scd.session_id = %s AND e.embedding IS NOT NULL
+    ORDER BY e.embed_id;
+"""
+
+# Enough to estimate an index's size before loading its vectors.
+SESSION_SIZE_SQL = """
+    SELECT count(*), coalesce(sum(octet_length(e.chunk_text)), 0)
+    FROM session_chunk_documents scd
+    JOIN embeddings e ON e.document_id = scd.document_id
+    WHERE scd.session_id = %s AND e.embedding IS NOT NULL;
+"""
+
+# Rough per-chunk bookkeeping cost (tuple, ints, list slot) on top of the text itself.
+_CHUNK_OVERHEAD_BYTES = 128
+
+
+class SessionIndex:
+    """An in-memory FAISS index over every chunk of one session's documents."""
+
+    def __init__(self, document_ids, chunks: List[RetrievedChunk], vectors):
+        self.document_key = SessionIndexCache.document_key(document_ids)
+        self.chunks = chunks
+        self.index = build_faiss_index(vectors)
+        self.nbytes = vectors.nbytes + sum(
+            len(chunk.chunk_text or "") + _CHUNK_OVERHEAD_BYTES for chunk in chunks
+        )
+
+    def search(self, query_vector, k: int) -> List[RetrievedChunk]:
+        """Returns the k chunks closest to query_vector, nearest first."""
+        return [chunk for chunk, _ in search_index(query_vector, self.index, self.chunks, k)]
+
+
+def estimate_index_bytes(chunk_count: int, text_bytes: int) -> int:
+    """The nbytes a SessionIndex over chunk_count chunks with text_bytes of text would have."""
+    return chunk_count * (EMBED_DIMENSION * 4 + _CHUNK_OVERHEAD_BYTES) + text_bytes
+
+
+def build_session_index(document_ids, rows) -> SessionIndex:
+    """Builds a SessionIndex from SESSION_VECTORS_SQL rows."""
+    chunks = [RetrievedChunk(*row[:4]) for row in rows]
+    if rows:
+        vectors = np.vstack([np.asarray(row[4], dtype="float32") for row in rows])
+    else:
+        vectors = np.empty((0, EMBED_DIMENSION), dtype="float32")
+    return SessionIndex(document_ids, chunks, vectors)
+
+
+class SessionIndexCache:
+    """
+    LRU cache of per-session FAISS indexes bounded by total memory. An entry is only
+    served while the session still has the document set it was built from, so a
+    session that gains documents is rebuilt on its next search even if the explicit
+    invalidation after an upload is missed. Sessions too large for the budget are
+    remembered (per document set) so their searches go straight to SQL.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._oversize = {}  # session_id -> document key that was too large to cache
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def document_key(document_ids):
+        return tuple(sorted(set(document_ids)))
+
+    def _remove_locked(self, session_id):
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def get(self, session_id: int, document_ids):
+        """Returns the session's index if it is cached and current, else None."""
+        document_key = self.document_key(document_ids)
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and entry.document_key != document_key:
+                self._remove_locked(session_id)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(session_id)
+            return entry
+
+    def is_oversize(self, session_id: int, document_ids) -> bool:
+        with self._lock:
+            return self._oversize.get(session_id) == self.document_key(document_ids)
+
+    def mark_oversize(self, session_id: int, document_ids, nbytes: int):
+        print(f"Session {session_id} index ({nbytes / 2**20:.1f} MB) exceeds the FAISS cache budget; searching it with SQL.")
+        with self._lock:
+            self._remove_locked(session_id)
+            self._oversize[session_id] = self.document_key(document_ids)
+
+    def put(self, session_id: int, entry: SessionIndex):
+        """Caches entry, evicting least recently used sessions to stay within budget."""
+        with self._lock:
+            self._remove_locked(session_id)
+            if entry.nbytes > self.max_bytes:
+                print(f"Session {session_id} index ({entry.nbytes / 2**20:.1f} MB) exceeds the FAISS cache budget; not cached.")
+                return
+
+            self._entries[session_id] = entry
+            self._bytes += entry.nbytes
+            while self._bytes > self.max_bytes:
+                oldest_id = next(iter(self._entries))
+                self._remove_locked(oldest_id)
+
+    def invalidate(self, session_id=None):
+        """Drops the session's index (every index if None)."""
+        with self._lock:
+            if session_id is None:
+                self._entries.clear()
+                self._oversize.clear()
+                self._bytes = 0
+            else:
+                self._remove_locked(session_id)
+                self._oversize.pop(session_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._entries),
+                "oversize_sessions": len(self._oversize),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+session_index_cache = SessionIndexCache(max_bytes=int(FAISS_CACHE_MAX_MB * 2**20))
+
+
+def get_session_index(cur, session_id: int, document_ids) -> Optional[SessionIndex]:
+    """
+    Returns the session's cached index, loading it from the embeddings table on a miss.
+    Returns None for a session too large for FAISS_CACHE_MAX_MB; search it with
+    Retrieval.search_session_chunks instead.
+    """
+    entry = session_index_cache.get(session_id, document_ids)
+    if entry is None:
+        if session_index_cache.is_oversize(session_id, document_ids):
+            return None
+
+        cur.execute(SESSION_SIZE_SQL, (session_id,))
+        nbytes = estimate_index_bytes(*cur.fetchone())
+        if nbytes > session_index_cache.max_bytes:
+            session_index_cache.mark_oversize(session_id, document_ids, nbytes)
+            return None
+
+        cur.execute(SESSION_VECTORS_SQL, (session_id,))
+        entry = build_session_index(document_ids, cur.fetchall())
+        session_index_cache.put(session_id, entry)
+    return entry
+
+
+def _load_session_index(session_id: int, document_ids) -> Optional[SessionIndex]:
+    with get_cursor() as cur:
+        return get_session_index(cur, session_id, document_ids)
+
+
+async def get_session_index_async(session_id: int, document_ids) -> Optional[SessionIndex]:
+    """
+    Async variant of get_session_index. A miss can parse hundreds of megabytes of
+    vectors, so the size check, the load and the build run on a pooled sync
+    connection in a worker thread instead of on the event loop.
+    """
+    entry = session_index_cache.get(session_id, document_ids)
+    if entry is None:
+        if session_index_cache.is_oversize(session_id, document_ids):
+            return None
+        entry = await asyncio.to_thread(_load_session_index, session_id, document_ids)
+    return entry
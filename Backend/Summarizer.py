@@ -2,26 +2,20 @@ import os
 import shutil
 import sys
 
-from google import genai
-from google.genai.types import GenerateContentConfig
-
 from markdown_it import MarkdownIt
 import re
 from xhtml2pdf import pisa
-from sentence_transformers import SentenceTransformer
-
+import LLMGateway as llm
+import Metrics as metrics
 from dbconnect import get_cursor
+from EmbeddingModel import encode_query
+from Retrieval import search_session_chunks
+from ContextBuilder import build_context
 
 GEMINI_MODEL_NAME = "gemini-2.5-flash-lite"
 
-LOCAL_EMBED_MODEL = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
 CHUNK_LIMIT = 75
-
-try:
-    CLIENT = genai.Client()
-except Exception as e:
-    print(f"CRITICAL ERROR: Failed to initialize Gemini Client. Check GEMINI_API_KEY. {e}", file=sys.stderr)
-    sys.exit(1)
+SUMMARY_QUERY = "Generate a comprehensive, structured summary of all documents in this session, formatted as revision notes."
 
 class ContextNotFoundError(Exception): pass
 
@@ -33,33 +27,24 @@ class NotificationService:
     def send_completion_alert(self, session_id, pdf_path): pass
 notification_service = NotificationService()
 
-def get_rag_context(session_id: int, summarization_query: str, k: int = CHUNK_LIMIT) -> str:
+def get_rag_context(session_id: int, summarization_query: str, k: int = CHUNK_LIMIT, retrieval_mode: str = None) -> str:
     try:
-        query_vector = LOCAL_EMBED_MODEL.encode([summarization_query], convert_to_numpy=True, normalize_embeddings=True).astype("float32")
-        query_embedding = query_vector[0].tolist()
+        with metrics.time_stage("embed"):
+            query_embedding = encode_query(summarization_query)
     except Exception as e:
         raise RuntimeError(f"Failed to generate embedding for query using local model: {e}")
 
-    query_vector_string = '[' + ','.join(map(str, query_embedding)) + ']'
-
     try:
-        with get_cursor() as cursor:
-            sql_query = """
-                SELECT  e.chunk_text 
-                FROM embeddings e
-                LEFT JOIN sessiondocuments s on s.document_id = e.document_id 
-                WHERE  s.session_id = %s 
-                ORDER BY e.embedding <=> %s::vector
-                LIMIT %s;
-            """
-            cursor.execute(sql_query, (session_id, query_vector_string, k))
-
-            chunks = cursor.fetchall()
+        with metrics.time_stage("retrieve"), get_cursor() as cursor:
+            chunks = search_session_chunks(
+                cursor, session_id, query_embedding, k, mode=retrieval_mode, query_text=summarization_query
+            )
 
     except Exception as e:
         raise RuntimeError(f"Database query failed during RAG context retrieval: {e}")
 
-    context_text = "\n\n---\n\n".join([row[0] for row in chunks if isinstance(row, tuple) and len(row) > 0])
+    with metrics.time_stage("context"):
+        context_text = build_context(chunks, query_embedding)
 
     if not context_text:
         print(f"Warning: RAG query returned 0 chunks for session ID {session_id}.")
@@ -67,12 +52,12 @@ def get_rag_context(session_id: int, summarization_query: str, k: int = CHUNK_LI
 
     return context_text
 
-def run_summarization_job(session_id: int, output_dir: str) -> str:
+def run_summarization_job(session_id: int, output_dir: str, retrieval_mode: str = None) -> str:
     db_connection.update_session_status(session_id, "Processing: Generating Context")
 
-    summarization_query = "Generate a comprehensive, structured summary of all documents in this session, formatted as revision notes."
+    summarization_query = SUMMARY_QUERY
 
-    context_text = get_rag_context(session_id, summarization_query, CHUNK_LIMIT)
+    context_text = get_rag_context(session_id, summarization_query, CHUNK_LIMIT, retrieval_mode)
 
     if not context_text:
         db_connection.update_session_status(session_id, "Failed: No context found")
@@ -120,21 +105,19 @@ def generate_llm_summary(context: str, query: str) -> str:
 
     try:
 
-        config = GenerateContentConfig(
-            system_instruction=system_prompt,
-            temperature=0.1
-        )
-
-        response = CLIENT.models.generate_content(
-            model=GEMINI_MODEL_NAME,
-            contents=user_prompt,
-            config=config
-        )
+        with metrics.time_stage("generate"):
+            response_text = llm.generate(
+                user_prompt,
+                model=GEMINI_MODEL_NAME,
+                system_instruction=system_prompt,
+                temperature=0.1,
+                cache=True
+            )
 
-        if not response.text:
+        if not response_text:
              raise ValueError("Gemini returned an empty response text.")
 
-        return response.text
+        return response_text
 
     except Exception as e:
         print(f"\n--- DEBUG API FAILURE ---", file=sys.stderr)
@@ -224,7 +207,7 @@ def generate_pdf(markdown_content: str, session_id: int, output_dir: str) -> str
     file_name = f"{summary_filename}.pdf"
     output_path = os.path.join(output_dir, file_name)
 
-    with open(output_path, "w+b") as result_file:
+    with metrics.time_stage("render"), open(output_path, "w+b") as result_file:
         pisa_status = pisa.CreatePDF(
             styled_html,
             dest=result_file
@@ -240,7 +223,7 @@ def cleanup_file(path: str):
     """Deletes the file at the given path."""
     os.remove(path)
 
-def Summarizer_main(session_id: int):
+def Summarizer_main(session_id: int, retrieval_mode: str = None):
     """
     The entry point for the summarization job, which handles directory creation,
     calls the job runner, and returns the path to the generated PDF.
@@ -259,7 +242,7 @@ def Summarizer_main(session_id: int):
     try:
         print(f"Starting summarization job for session ID: {session_id}...")
 
-        file_path_to_return = run_summarization_job(session_id, OUTPUT_DIR)
+        file_path_to_return = run_summarization_job(session_id, OUTPUT_DIR, retrieval_mode)
 
         print(f"Job for session ID {session_id} completed successfully.")
 
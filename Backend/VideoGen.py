@@ -1,7 +1,9 @@
 # experiment
 import base64
+import io
 import os
 import subprocess
+import time
 from time import sleep
 
 import requests
@@ -13,6 +15,8 @@ import json
 
 from openai import OpenAI
 
+import Metrics as metrics
+import Providers as providers
 from dbconnect import get_cursor
 from ScriptGen import generate_video_script
 
@@ -25,7 +29,8 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-nebius_api_key = os.environ["NEBIUS_API_KEY"]
+# Not needed when the image provider runs in fake or replay mode.
+nebius_api_key = os.environ.get("NEBIUS_API_KEY", "")
 
 
 def ensure_empty_dir(path):
@@ -40,7 +45,7 @@ def ensure_empty_dir(path):
 
 
 
-API_URL = "https://api.tokenfactory.nebius.com/v1/images/generations"
+API_URL = os.environ.get("NEBIUS_API_URL", "https://api.tokenfactory.nebius.com/v1/images/generations")
 
 # --- Request Headers ---
 headers = {
@@ -53,11 +58,47 @@ schnell_model = "black-forest-labs/flux-schnell"
 
 
 def generate_tts_gtts(text, outfile="speech.mp3"):
-    tts = gTTS(text=text, lang="en")
-    tts.save(outfile)
+    def synthesize():
+        buffer = io.BytesIO()
+        gTTS(text=text, lang="en").write_to_fp(buffer)
+        return buffer.getvalue()
+
+    with metrics.time_stage("tts"):
+        audio = providers.call(
+            "gtts",
+            {"text": text, "lang": "en"},
+            live=synthesize,
+            fake=lambda: providers.fake_mp3(text)
+        )
+    with open(outfile, "wb") as f:
+        f.write(audio)
     return outfile
 
 
+def generate_image(data):
+    """Generates the slide image described by the Nebius request body and returns PNG bytes."""
+    def request_image():
+        response = requests.post(API_URL, headers=headers, data=json.dumps(data))
+        response.raise_for_status()
+
+        response_data = response.json()
+
+        if response.status_code == 402:
+            print(f"Error 402: Payment Required. Response ID: {response_data.get('id')}")
+            return None
+
+        return base64.b64decode(response_data['data'][0]['b64_json'])
+
+    width, height = (int(side) for side in data["size"].split("x"))
+    with metrics.time_stage("image"):
+        return providers.call(
+            "image",
+            data,
+            live=request_image,
+            fake=lambda: providers.fake_png(data["prompt"], (width, height))
+        )
+
+
 def script_to_video(slides):
     # Ensure folders are empty / created
     ensure_empty_dir("EduVideo/audio")
@@ -91,18 +132,11 @@ def script_to_video(slides):
         }
 
         try:
-            response = requests.post(API_URL, headers=headers, data=json.dumps(data))
-            response.raise_for_status()
+            image_data = generate_image(data)
 
-            response_data = response.json()
-
-            if response.status_code == 402:
-                print(f"Error 402: Payment Required. Response ID: {response_data.get('id')}")
+            if image_data is None:
                 return
 
-            image_b64 = response_data['data'][0]['b64_json']
-
-            image_data = base64.b64decode(image_b64)
             BASE_DIR = "EduVideo/generated_images"
 
             file_name = f"slide_{i}.png"
@@ -136,6 +170,7 @@ def script_to_video(slides):
         duration = MP3(audio_path).info.length
 
         # === Create frames ===
+        render_started = time.perf_counter()
         bg_img = Image.new("RGB", (1920, 1080), bg_color)
         w, h = bg_img.size
         corner_img = Image.open(img_path).convert("RGBA")
@@ -178,9 +213,12 @@ def script_to_video(slides):
             draw.multiline_text((200, 400), partial_text, font=font, fill=text_color, spacing=15)
             frame.save(f"{frame_dir}/frame_{f_idx:04d}.png")
 
+        metrics.observe_stage("render", time.perf_counter() - render_started)
+
         # === Create slide video (duration synced to narration/typing) ===
         fps = max(5, int(len(partial_texts) / duration))
         video_path = f"EduVideo/output/slide_{i}.mp4"
+        encode_started = time.perf_counter()
         subprocess.run([
             "ffmpeg", "-y",
             "-framerate", str(fps),
@@ -191,6 +229,7 @@ def script_to_video(slides):
             "-c:a", "aac", "-ar", "44100", "-ac", "2",
             video_path
         ], check=True)
+        metrics.observe_stage("encode", time.perf_counter() - encode_started)
 
         slide_videos.append(video_path)
 
@@ -200,13 +239,14 @@ def script_to_video(slides):
             f.write(f"file '{os.path.abspath(v)}'\n")
 
     final_video = "EduVideo/output/teaching_video.mp4"
-    subprocess.run([
-        "ffmpeg", "-y",
-        "-f", "concat", "-safe", "0",
-        "-i", "EduVideo/output/list.txt",
-        "-c", "copy",
-        final_video
-    ])
+    with metrics.time_stage("encode"):
+        subprocess.run([
+            "ffmpeg", "-y",
+            "-f", "concat", "-safe", "0",
+            "-i", "EduVideo/output/list.txt",
+            "-c", "copy",
+            final_video
+        ])
 
     return final_video
 
@@ -0,0 +1,96 @@
+import io
+import os
+import random
+import re
+
+DB_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "DB Data")
+
+# ('title',decode('<hex>','hex'),user_id) rows of the document dump.
+_DOCUMENT_ROW = re.compile(r"\(\s*'((?:[^']|'')*)'\s*,\s*decode\('([0-9A-Fa-f]+)'\s*,\s*'hex'\)")
+# (session_id,'User','question',...) rows of the chat_history dump.
+_QUESTION_ROW = re.compile(r"\(\s*\d+\s*,\s*'User'\s*,\s*'((?:[^']|'')*)'")
+
+DEFAULT_QUESTIONS = [
+    "What is an algorithm?",
+    "Summarize the main steps described in the document.",
+    "Give an example that illustrates the key definition.",
+    "How do the two main approaches compare?",
+    "What are the most common mistakes to avoid?",
+]
+
+_VOCABULARY = (
+    "algorithm input output problem solution step instruction finite sequence correctness proof "
+    "efficiency time space complexity analysis design pattern structure array list graph tree node "
+    "edge search sort merge divide conquer recursion iteration loop invariant example definition "
+    "theorem lemma property method result data value function variable condition case bound"
+).split()
+
+
+def _dump_files(dump_dir, prefix):
+    if not os.path.isdir(dump_dir):
+        return []
+    return sorted(
+        os.path.join(dump_dir, name) for name in os.listdir(dump_dir)
+        if name.startswith(prefix) and name.endswith(".sql")
+    )
+
+
+def load_dump_documents(dump_dir=DB_DATA_DIR):
+    """Returns (title, pdf_bytes) for every document in the DB Data document dump."""
+    documents = []
+    for path in _dump_files(dump_dir, "_document_"):
+        with open(path, encoding="utf-8") as f:
+            for title, hex_content in _DOCUMENT_ROW.findall(f.read()):
+                documents.append((title.replace("''", "'"), bytes.fromhex(hex_content)))
+    return documents
+
+
+def load_dump_questions(dump_dir=DB_DATA_DIR):
+    """Returns the questions students asked in the DB Data chat_history dump."""
+    questions = []
+    for path in _dump_files(dump_dir, "chat_history_"):
+        with open(path, encoding="utf-8") as f:
+            questions.extend(question.replace("''", "'") for question in _QUESTION_ROW.findall(f.read()))
+    return questions or list(DEFAULT_QUESTIONS)
+
+
+def synthetic_pdf(index, pages=5, words_per_page=350):
+    """Returns a deterministic text PDF of the given size, built with reportlab."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    rng = random.Random(index)
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+
+    for page in range(pages):
+        text = pdf.beginText(50, height - 60)
+        text.setFont("Helvetica", 10)
+        text.textLine(f"Synthetic document {index}, page {page + 1}")
+        words = [rng.choice(_VOCABULARY) for _ in range(words_per_page)]
+        for start in range(0, len(words), 14):
+            text.textLine(" ".join(words[start:start + 14]))
+        pdf.drawText(text)
+        pdf.showPage()
+
+    pdf.save()
+    return buffer.getvalue()
+
+
+def build_corpus(source, count, pages=5, words_per_page=350, dump_dir=DB_DATA_DIR):
+    """
+    Returns count (title, pdf_bytes) documents from source: "dump" cycles through the
+    DB Data documents, "synthetic" generates new ones.
+    """
+    if source == "dump":
+        documents = load_dump_documents(dump_dir)
+        if not documents:
+            raise FileNotFoundError(f"No documents found in the dumps under {dump_dir}.")
+        # Repeats are renamed but byte-identical, so they exercise the dedup path.
+        return [
+            (f"{i // len(documents)}_{documents[i % len(documents)][0]}", documents[i % len(documents)][1])
+            for i in range(count)
+        ]
+
+    return [(f"synthetic_{i}.pdf", synthetic_pdf(i, pages, words_per_page)) for i in range(count)]
@@ -0,0 +1,361 @@
+"""
+End-to-end benchmark of the StudyMate API.
+
+Uploads a corpus (the DB Data dumps or synthetic PDFs), then drives the hot endpoints
+with concurrent clients and writes p50/p95/p99 latency, throughput and peak RSS per
+scenario as JSON, so runs can be compared against a saved baseline. Run from Backend:
+
+    python -m benchmarks.run_benchmarks --start-server --output bench.json
+    python -m benchmarks.run_benchmarks --start-server --baseline bench.json
+
+With --start-server the API runs under uvicorn with PROVIDER_MODE=fake, so Gemini, TTS
+and image calls are served by the local stubs in Providers.py with their simulated
+latencies. The database named by DATABASE_NAME, DATABASE_USER, DATABASE_PASSWORD and
+DATABASE_HOST (see dbconnect.py) must be a Postgres instance with pgvector. The server's
+output goes to --server-log.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.corpus import build_corpus, load_dump_questions
+from benchmarks.stats import RSSSampler, Timer, client_peak_rss_mb, summarize_latencies
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("ingest", "ask", "ask_stream", "summary", "flashcards", "audio", "video")
+# Audio and video render into fixed working directories (see VideoGen.py), so concurrent
+# requests would overwrite each other's files; they always run one at a time.
+SERIAL_SCENARIOS = {"audio", "video"}
+JOB_POLL_SECONDS = 0.5
+# /ask/ reports failures as a 200 response whose answer starts with this.
+ASK_ERROR_PREFIX = "Sorry, an internal error occurred"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--start-server", action="store_true", help="Run the API under uvicorn for the benchmark.")
+    parser.add_argument("--port", type=int, default=8765, help="Port used with --start-server.")
+    parser.add_argument("--provider-mode", default="fake", help="PROVIDER_MODE for the started server.")
+    parser.add_argument("--server-log", default="benchmark-server.log", help="File receiving the started server's output.")
+    parser.add_argument("--init-schema", action="store_true", help="Create the schema (dbScript.sql) and apply migrations first.")
+    parser.add_argument("--corpus", choices=("dump", "synthetic"), default="dump")
+    parser.add_argument("--documents", type=int, default=4, help="Documents uploaded, one session each.")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per synthetic document.")
+    parser.add_argument("--words-per-page", type=int, default=350)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients for ask scenarios.")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per ask scenario.")
+    parser.add_argument("--heavy-concurrency", type=int, default=2, help="Concurrent clients for summary/flashcards (audio/video always run one at a time).")
+    parser.add_argument("--heavy-requests", type=int, default=4, help="Requests per summary/flashcards/audio/video scenario.")
+    parser.add_argument("--timeout", type=float, default=600, help="Per-request timeout in seconds.")
+    parser.add_argument("--output", help="Write the results JSON here (default: stdout).")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to compare against.")
+    return parser.parse_args(argv)
+
+
+def init_schema():
+    from dbconnect import get_cursor
+    from migrate import apply_migrations
+
+    with get_cursor() as cur:
+        cur.execute("SELECT to_regclass('public.user_login');")
+        exists = cur.fetchone()[0] is not None
+
+    if not exists:
+        with open(os.path.join(BACKEND_DIR, "dbScript.sql")) as f:
+            with get_cursor() as cur:
+                cur.execute(f.read())
+    apply_migrations()
+
+
+def start_server(port, provider_mode, log_file):
+    env = dict(os.environ, PROVIDER_MODE=provider_mode)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+    )
+
+
+async def wait_for_server(client, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/TestAPI")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"The API did not come up within {timeout}s.")
+
+
+async def benchmark_user(client):
+    email = f"bench_{uuid.uuid4().hex[:12]}@example.com"
+    response = await client.post("/signup", json={"full_name": "Bench Mark", "email": email, "password": "benchmark"})
+    response.raise_for_status()
+    return response.json()["user_id"]
+
+
+async def run_scenario(name, count, concurrency, request):
+    """
+    Runs request(i) for i in range(count) with at most concurrency in flight. request
+    returns a dict of named durations in seconds; "latency" is the end-to-end time.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    samples, errors = {}, []
+
+    async def one(i):
+        async with semaphore:
+            try:
+                for metric, seconds in (await request(i)).items():
+                    samples.setdefault(metric, []).append(seconds)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    with Timer() as wall:
+        await asyncio.gather(*(one(i) for i in range(count)))
+
+    completed = len(samples.get("latency", []))
+    result = {
+        "requests": count,
+        "completed": completed,
+        "errors": len(errors),
+        "concurrency": concurrency,
+        "wall_seconds": round(wall.elapsed, 3),
+        "throughput_rps": round(completed / wall.elapsed, 3) if wall.elapsed else None,
+    }
+    for metric, values in samples.items():
+        result[f"{metric}_ms"] = summarize_latencies(values)
+    if errors:
+        result["sample_errors"] = errors[:5]
+
+    print(f"{name}: {completed}/{count} ok, p95 {result.get('latency_ms', {}).get('p95')} ms", file=sys.stderr)
+    return result
+
+
+def check(response, media_type=None):
+    """Raises unless the response succeeded and, when given, carries the expected media type."""
+    response.raise_for_status()
+    content_type = response.headers.get("content-type", "")
+    if media_type and not content_type.startswith(media_type):
+        raise RuntimeError(f"Expected {media_type}, got {content_type or 'no content type'}.")
+    return response
+
+
+async def ingest(client, user_id, documents, concurrency):
+    """Uploads every document into its own session and waits for each ingestion job."""
+    session_ids = []
+
+    async def upload(i):
+        title, content = documents[i]
+        started = time.perf_counter()
+        response = check(await client.post(
+            "/upload/", params={"user_id": user_id}, files={"file": (title, content, "application/pdf")}
+        ), "application/json")
+        accepted = time.perf_counter() - started
+        job_id = response.json().get("job_id")
+        if not job_id:
+            raise RuntimeError(f"The upload returned no job: {response.text[:200]}")
+
+        while True:
+            job = check(await client.get(f"/jobs/{job_id}"), "application/json").json()
+            if job.get("status") == "completed":
+                session_id = (job.get("result") or {}).get("session_id")
+                if session_id is None:
+                    raise RuntimeError(f"Job {job_id} completed without a session: {job}")
+                session_ids.append(session_id)
+                return {"latency": time.perf_counter() - started, "accept": accepted}
+            if job.get("status") == "failed":
+                raise RuntimeError(job.get("error") or f"Job {job_id} failed.")
+            await asyncio.sleep(JOB_POLL_SECONDS)
+
+    result = await run_scenario("ingest", len(documents), concurrency, upload)
+    result["documents"] = len(documents)
+    result["document_bytes"] = sum(len(content) for _, content in documents)
+    return result, session_ids
+
+
+async def ask(client, session_ids, questions, i):
+    started = time.perf_counter()
+    response = check(await client.post("/ask/", json={
+        "session_id": session_ids[i % len(session_ids)],
+        "question": questions[i % len(questions)],
+    }), "application/json")
+    answer = response.json().get("response")
+    if not isinstance(answer, str) or not answer.strip() or answer.startswith(ASK_ERROR_PREFIX):
+        raise RuntimeError(f"/ask/ failed: {str(answer)[:200]}")
+    return {"latency": time.perf_counter() - started}
+
+
+async def ask_stream(client, session_ids, questions, i):
+    started = time.perf_counter()
+    first_token, done = None, False
+    async with client.stream("POST", "/ask/stream", json={
+        "session_id": session_ids[i % len(session_ids)],
+        "question": questions[i % len(questions)],
+    }) as response:
+        check(response, "text/event-stream")
+        async for line in response.aiter_lines():
+            if line.startswith("event: error"):
+                raise RuntimeError("The stream reported an error.")
+            if first_token is None and line.startswith("event: token"):
+                first_token = time.perf_counter() - started
+            if line.startswith("event: done"):
+                done = True
+    if not done:
+        raise RuntimeError("The stream ended without a done event.")
+    return {"latency": time.perf_counter() - started, "first_token": first_token or 0.0}
+
+
+def download(method, path, make_kwargs, media_type):
+    """Scenario that requests one generated artifact (PDF, JSON, MP3 or MP4) per session."""
+    async def request(client, session_ids, questions, i):
+        started = time.perf_counter()
+        response = check(await client.request(method, path, **make_kwargs(session_ids[i % len(session_ids)])), media_type)
+        if not response.content:
+            raise RuntimeError(f"{path} returned an empty body.")
+        return {"latency": time.perf_counter() - started}
+    return request
+
+
+HEAVY_SCENARIOS = {
+    "summary": download("GET", "/generateSessionSummary", lambda session_id: {"params": {"session_id": session_id}}, "application/pdf"),
+    "flashcards": download("GET", "/generateFlashcards", lambda session_id: {"params": {"session_id": session_id}}, "application/json"),
+    "audio": download("GET", "/generateAudioLesson", lambda session_id: {"params": {"session_id": session_id}}, "audio/mpeg"),
+    "video": download("POST", "/generateVideo", lambda session_id: {"json": {"session_id": session_id}}, "video/mp4"),
+}
+
+
+async def run_benchmarks(args, sampler):
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    base_url = f"http://127.0.0.1:{args.port}" if args.start_server else args.base_url
+    results, resources = {}, {}
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+        await wait_for_server(client)
+        user_id = await benchmark_user(client)
+        questions = load_dump_questions()
+
+        documents = build_corpus(args.corpus, args.documents, args.pages, args.words_per_page)
+        # Every other scenario needs sessions, so ingestion always runs; it is only reported when asked for.
+        ingest_result, session_ids = await ingest(client, user_id, documents, args.concurrency)
+        if "ingest" in scenarios:
+            results["ingest"] = ingest_result
+            if sampler:
+                resources["ingest"] = round(sampler.peak_kb / 1024, 1)
+        if not session_ids:
+            raise SystemExit("No document was ingested; see sample_errors in the ingest results.")
+
+        for name in scenarios:
+            if name == "ingest":
+                continue
+            if sampler:
+                sampler.reset()
+
+            if name in ("ask", "ask_stream"):
+                handler, count, concurrency = (ask if name == "ask" else ask_stream), args.requests, args.concurrency
+            else:
+                handler, count = HEAVY_SCENARIOS[name], args.heavy_requests
+                concurrency = 1 if name in SERIAL_SCENARIOS else args.heavy_concurrency
+
+            results[name] = await run_scenario(
+                name, count, concurrency, lambda i, handler=handler: handler(client, session_ids, questions, i)
+            )
+            if sampler:
+                resources[name] = round(sampler.peak_kb / 1024, 1)
+
+    return results, resources
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """Prints the p95 latency and throughput change of each scenario against the baseline."""
+    for name, result in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        new_p95 = result.get("latency_ms", {}).get("p95")
+        old_p95 = previous.get("latency_ms", {}).get("p95")
+        if new_p95 is None or not old_p95:
+            continue
+        print(
+            f"{name:12s} p95 {old_p95:10.1f} -> {new_p95:10.1f} ms ({(new_p95 - old_p95) / old_p95:+.1%}), "
+            f"throughput {previous.get('throughput_rps')} -> {result.get('throughput_rps')} req/s",
+            file=sys.stderr
+        )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.init_schema:
+        init_schema()
+
+    server, sampler, server_log = None, None, None
+    if args.start_server:
+        server_log = open(args.server_log, "w")
+        server = start_server(args.port, args.provider_mode, server_log)
+        sampler = RSSSampler(server.pid).start()
+        print(f"Server output: {os.path.abspath(args.server_log)}", file=sys.stderr)
+
+    try:
+        scenarios, server_peak_mb = asyncio.run(run_benchmarks(args, sampler))
+    finally:
+        if sampler:
+            sampler.stop()
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+            server_log.close()
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": sys.version.split()[0],
+            "provider_mode": args.provider_mode if args.start_server else os.environ.get("PROVIDER_MODE"),
+            "args": vars(args),
+        },
+        "scenarios": scenarios,
+        "resources": {
+            # Peak RSS of the API process tree (including OCR workers) while each scenario ran.
+            "server_peak_rss_mb": server_peak_mb or None,
+            "client_peak_rss_mb": client_peak_rss_mb(),
+        },
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
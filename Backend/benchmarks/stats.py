@@ -0,0 +1,104 @@
+import resource
+import threading
+import time
+
+
+def percentile(sorted_values, fraction):
+    """Linearly interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize_latencies(seconds):
+    """Latency summary in milliseconds."""
+    values = sorted(seconds)
+    if not values:
+        return {"count": 0}
+
+    def ms(value):
+        return round(value * 1000, 2)
+
+    return {
+        "count": len(values),
+        "min": ms(values[0]),
+        "mean": ms(sum(values) / len(values)),
+        "p50": ms(percentile(values, 0.50)),
+        "p95": ms(percentile(values, 0.95)),
+        "p99": ms(percentile(values, 0.99)),
+        "max": ms(values[-1]),
+    }
+
+
+def _read_rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        pass
+    return 0
+
+
+def _children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except (FileNotFoundError, PermissionError):
+        return []
+
+
+def process_tree_rss_kb(pid):
+    """Resident memory of pid and all of its descendants (e.g. OCR workers), in kB."""
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        total += _read_rss_kb(current)
+        pending.extend(_children(current))
+    return total
+
+
+class RSSSampler:
+    """Samples the resident memory of a process tree in the background and keeps the peak."""
+
+    def __init__(self, pid, interval=0.25):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_kb = max(self.peak_kb, process_tree_rss_kb(self.pid))
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def reset(self):
+        self.peak_kb = process_tree_rss_kb(self.pid)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.peak_kb
+
+
+def client_peak_rss_mb():
+    """Peak resident memory of this (client) process."""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class Timer:
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
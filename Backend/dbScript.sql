@@ -27,12 +27,36 @@ CREATE TABLE user_login (
 CREATE TABLE "document" (
 document_id serial4 NOT NULL,
 document_title varchar(255) NOT NULL,
-pdf_content bytea NOT NULL,
-user_id int4 NOT NULL,
+pdf_content bytea NULL,
+user_id int4 NULL,
+content_hash char(64) NULL,
+embedded_at timestamp NULL,
+ingest_job_id char(32) NULL,
+content_document_id int4 NULL,
 CONSTRAINT document_pkey PRIMARY KEY (document_id),
-CONSTRAINT fk_user FOREIGN KEY (user_id) REFERENCES user_login(user_id) ON DELETE CASCADE
+CONSTRAINT fk_user FOREIGN KEY (user_id) REFERENCES user_login(user_id) ON DELETE SET NULL,
+CONSTRAINT document_content_document_id_fkey FOREIGN KEY (content_document_id) REFERENCES "document"(document_id)
 );
 
+CREATE INDEX document_content_hash_idx ON "document" (content_hash);
+CREATE INDEX document_content_document_id_idx ON "document" (content_document_id);
+
+-- Deleting a user removes their own uploads and the documents nobody else shares;
+-- shared ones only lose their user_id.
+CREATE OR REPLACE FUNCTION delete_unshared_user_documents() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM "document" WHERE user_id = OLD.user_id AND content_document_id IS NOT NULL;
+    DELETE FROM "document" d
+    WHERE d.user_id = OLD.user_id
+      AND NOT EXISTS (SELECT 1 FROM "document" s WHERE s.content_document_id = d.document_id);
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER user_login_delete_unshared_documents
+    BEFORE DELETE ON user_login
+    FOR EACH ROW EXECUTE FUNCTION delete_unshared_user_documents();
+
 
 -- public.embeddings definition
 
@@ -46,13 +70,18 @@ CREATE EXTENSION IF NOT EXISTS vector;
 CREATE TABLE embeddings (
 embed_id serial4 NOT NULL,
 document_id int4 NOT NULL,
-embedding public.vector NULL,
+embedding public.vector(384) NULL,
 chunk_text varchar NULL,
 chunk_index int4 NULL,
+chunk_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', coalesce(chunk_text, ''))) STORED,
 CONSTRAINT embeddings_pkey PRIMARY KEY (embed_id),
 CONSTRAINT embeddings_document_id_fkey FOREIGN KEY (document_id) REFERENCES "document"(document_id) ON DELETE CASCADE
 );
 
+CREATE INDEX embeddings_embedding_hnsw_idx ON embeddings USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+CREATE INDEX embeddings_document_id_chunk_index_idx ON embeddings (document_id, chunk_index);
+CREATE INDEX embeddings_chunk_tsv_idx ON embeddings USING gin (chunk_tsv);
+
 
 -- public.sessions definition
 
@@ -86,6 +115,49 @@ CONSTRAINT chat_history_sender_check CHECK (((sender)::text = ANY ((ARRAY['User'
 CONSTRAINT chat_history_session_id_fkey FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
 );
 
+CREATE INDEX chat_history_session_id_created_at_message_id_idx ON chat_history (session_id, created_at, message_id);
+
+
+-- public.session_memory definition
+
+-- Drop table
+
+-- DROP TABLE session_memory;
+
+CREATE TABLE session_memory (
+session_id int4 NOT NULL,
+summary text DEFAULT '' NOT NULL,
+summarized_through int4 DEFAULT 0 NOT NULL,
+updated_at timestamp DEFAULT now() NOT NULL,
+CONSTRAINT session_memory_pkey PRIMARY KEY (session_id),
+CONSTRAINT session_memory_session_id_fkey FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+);
+
+
+-- public.ingest_jobs definition
+
+-- Drop table
+
+-- DROP TABLE ingest_jobs;
+
+CREATE TABLE ingest_jobs (
+job_id char(32) NOT NULL,
+status varchar(16) DEFAULT 'queued' NOT NULL,
+stage varchar(32) DEFAULT 'queued' NOT NULL,
+progress real DEFAULT 0 NOT NULL,
+pages_done int4 DEFAULT 0 NOT NULL,
+page_count int4 NULL,
+chunks_embedded int4 DEFAULT 0 NOT NULL,
+deduplicated bool DEFAULT false NOT NULL,
+result jsonb NULL,
+error text NULL,
+created_at timestamp DEFAULT now() NOT NULL,
+updated_at timestamp DEFAULT now() NOT NULL,
+CONSTRAINT ingest_jobs_pkey PRIMARY KEY (job_id)
+);
+
+CREATE INDEX ingest_jobs_status_updated_at_idx ON ingest_jobs (status, updated_at);
+
 
 -- public.sessiondocuments definition
 
@@ -102,3 +174,12 @@ CONSTRAINT sessiondocuments_session_id_document_id_key UNIQUE (session_id, docum
 CONSTRAINT fk_document FOREIGN KEY (document_id) REFERENCES "document"(document_id) ON DELETE CASCADE,
 CONSTRAINT fk_session FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
 );
+
+CREATE INDEX sessiondocuments_document_id_idx ON sessiondocuments (document_id);
+
+-- A session's documents resolved to the documents holding their chunks.
+CREATE VIEW session_chunk_documents AS
+SELECT DISTINCT sd.session_id, COALESCE(d.content_document_id, d.document_id) AS document_id
+FROM sessiondocuments sd
+JOIN "document" d ON d.document_id = sd.document_id;
+
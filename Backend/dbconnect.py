@@ -1,7 +1,18 @@
 
+import io
+import struct
+import threading
+import time
+
+import asyncio
+
 import psycopg2
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
+from pgvector import Vector
+from pgvector.psycopg import register_vector_async
 from pgvector.psycopg2 import register_vector
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
 
 import os
 from dotenv import load_dotenv
@@ -10,8 +21,21 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
-@contextmanager
-def get_cursor():
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", 1))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", 10))
+# Idle connections above the minimum are closed after this many seconds.
+DB_POOL_IDLE_TIMEOUT = float(os.environ.get("DB_POOL_IDLE_TIMEOUT", 300))
+# Connections idle for longer than this are pinged before being handed out.
+DB_POOL_HEALTH_CHECK_AFTER = float(os.environ.get("DB_POOL_HEALTH_CHECK_AFTER", 30))
+# How long get_cursor waits for a free connection when the pool is exhausted.
+DB_POOL_ACQUIRE_TIMEOUT = float(os.environ.get("DB_POOL_ACQUIRE_TIMEOUT", 30))
+
+
+class PoolTimeout(Exception): pass
+
+
+def connect():
+    """Opens a new database connection with the pgvector adapters registered."""
     conn = psycopg2.connect(
         dbname=os.environ["DATABASE_NAME"],
         user=os.environ["DATABASE_USER"],
@@ -20,12 +44,261 @@ def get_cursor():
         port="5432",
         sslmode="require"
     )
+    register_vector(conn)
+    conn.commit()
+    return conn
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections. Connections are reused LIFO so the
+    warm ones stay busy, checked with a ping when they have been idle for a while,
+    and closed once idle for longer than idle_timeout (down to min_size).
+    """
+
+    def __init__(self, min_size, max_size, idle_timeout, health_check_after, acquire_timeout):
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.acquire_timeout = acquire_timeout
+
+        self._idle = []
+        self._size = 0
+        self._cond = threading.Condition()
+
+        for _ in range(self.min_size):
+            self._idle.append((connect(), time.monotonic()))
+            self._size += 1
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _reap_idle_locked(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._idle and self._size > self.min_size and self._idle[0][1] < cutoff:
+            conn, _ = self._idle.pop(0)
+            self._size -= 1
+            self._close_quietly(conn)
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
 
+    def getconn(self):
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            with self._cond:
+                while True:
+                    self._reap_idle_locked()
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        conn, last_used = None, None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"No database connection available within {self.acquire_timeout}s.")
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    return connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+
+            if self._is_healthy(conn, last_used):
+                return conn
+
+            self._discard(conn)
+
+    def _discard(self, conn):
+        self._close_quietly(conn)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def putconn(self, conn):
+        if conn.closed or conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {"size": self._size, "idle": len(self._idle), "in_use": self._size - len(self._idle)}
+
+    def closeall(self):
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._size -= 1
+                self._close_quietly(conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    idle_timeout=DB_POOL_IDLE_TIMEOUT,
+                    health_check_after=DB_POOL_HEALTH_CHECK_AFTER,
+                    acquire_timeout=DB_POOL_ACQUIRE_TIMEOUT
+                )
+    return _pool
+
+
+def pool_stats():
+    """Stats of the sync pool, without creating it if nothing has used it yet."""
+    return _pool.stats() if _pool is not None else {}
+
+
+@contextmanager
+def get_cursor():
+    pool = get_pool()
+    conn = pool.getconn()
 
     cur = conn.cursor()
     try:
         yield cur
         conn.commit()
+    except BaseException:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
     finally:
         cur.close()
-        conn.close()
\ No newline at end of file
+        pool.putconn(conn)
+
+
+def _async_conninfo():
+    return make_conninfo(
+        dbname=os.environ["DATABASE_NAME"],
+        user=os.environ["DATABASE_USER"],
+        password=os.environ["DATABASE_PASSWORD"],
+        host=os.environ["DATABASE_HOST"],
+        port="5432",
+        sslmode="require"
+    )
+
+
+async def _configure_async_connection(conn):
+    await register_vector_async(conn)
+    await conn.commit()
+
+
+_async_pool = None
+_async_pool_lock = asyncio.Lock()
+
+
+async def get_async_pool():
+    """
+    Returns the process-wide psycopg 3 async pool used by the FastAPI handlers,
+    opening it on first use. Sized and timed out by the same DB_POOL_* settings.
+    """
+    global _async_pool
+    if _async_pool is None:
+        async with _async_pool_lock:
+            if _async_pool is None:
+                pool = AsyncConnectionPool(
+                    _async_conninfo(),
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=max(DB_POOL_MAX_SIZE, DB_POOL_MIN_SIZE, 1),
+                    max_idle=DB_POOL_IDLE_TIMEOUT,
+                    timeout=DB_POOL_ACQUIRE_TIMEOUT,
+                    check=AsyncConnectionPool.check_connection,
+                    configure=_configure_async_connection,
+                    open=False
+                )
+                await pool.open()
+                _async_pool = pool
+    return _async_pool
+
+
+async def close_async_pool():
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+
+
+def async_pool_stats():
+    """psycopg_pool's stats of the async pool (size, available, waiting, ...), or {} before it is opened."""
+    return _async_pool.get_stats() if _async_pool is not None else {}
+
+
+@asynccontextmanager
+async def get_async_cursor():
+    """
+    Async counterpart of get_cursor for use inside async endpoints: commits on
+    success and rolls back on error without blocking the event loop.
+    """
+    pool = await get_async_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            yield cur
+
+
+_PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_PGCOPY_TRAILER = struct.pack(">h", -1)
+
+
+def copy_embeddings(cur, rows):
+    """
+    Bulk-loads (document_id, chunk_index, chunk_text, vector) rows into the embeddings
+    table with a single binary COPY, encoding vectors with pgvector's binary format.
+    Returns the number of rows written.
+    """
+    buf = io.BytesIO()
+    buf.write(_PGCOPY_HEADER)
+
+    row_count = 0
+    for document_id, chunk_index, chunk_text, vector in rows:
+        # Postgres text cannot hold NUL bytes, which OCR output occasionally contains.
+        text_bytes = chunk_text.replace("\x00", "").encode("utf-8")
+        vector_bytes = Vector(vector).to_binary()
+
+        buf.write(struct.pack(">hiiii", 4, 4, document_id, 4, chunk_index))
+        buf.write(struct.pack(">i", len(text_bytes)))
+        buf.write(text_bytes)
+        buf.write(struct.pack(">i", len(vector_bytes)))
+        buf.write(vector_bytes)
+        row_count += 1
+
+    buf.write(_PGCOPY_TRAILER)
+    buf.seek(0)
+
+    cur.copy_expert(
+        "COPY embeddings (document_id, chunk_index, chunk_text, embedding) FROM STDIN WITH (FORMAT binary);",
+        buf
+    )
+    return row_count
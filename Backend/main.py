@@ -1,33 +1,56 @@
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Literal
 
-from fastapi import FastAPI, UploadFile
+from fastapi import FastAPI, UploadFile, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, EmailStr
 import uvicorn
 
 import asyncio
+import base64
+from datetime import datetime
+from contextlib import asynccontextmanager
 from fastapi import BackgroundTasks, status
 from fastapi.exceptions import HTTPException
 import os
 import shutil
+import time
+import uuid
 
 from rest_framework import status
-from sentence_transformers import SentenceTransformer
 from starlette.background import BackgroundTask
-from starlette.responses import  FileResponse
-
-from Flashcards import run_flashcard_job
-from Summarizer import Summarizer_main, db_connection
-from dbconnect import get_cursor
+from starlette.responses import  FileResponse, StreamingResponse, PlainTextResponse
+from starlette.routing import Match
+
+from Flashcards import run_flashcard_job, FLASHCARD_QUERY
+from Summarizer import Summarizer_main, db_connection, SUMMARY_QUERY
+from dbconnect import get_async_cursor, close_async_pool, pool_stats, async_pool_stats
+from EmbeddingModel import encode_query, precompute_queries, query_cache_stats
+from Retrieval import search_session_chunks_async, get_session_document_ids_async, join_chunks, resolve_retrieval_mode
+from SessionIndexCache import get_session_index_async, session_index_cache
+from Reranker import RERANK_ENABLED, candidate_count, rerank_chunks, get_reranker
+from AnswerCache import answer_cache
+from ChatMemory import load_chat_memory_async, update_session_memory
 import bcrypt
-from PDFUtil import read_scanned_pdf, chunk_text, embed_chunks, generate_response, generate_session_name
+from PDFUtil import agenerate_response, astream_response
+from IngestJobs import submit_ingestion, get_job_async, job_counts
+from LLMGateway import gateway_stats
+import Metrics as metrics
 from AudioGen import cleanup_directory, blocking_audio_generation_task
 
 import json
 from VideoGen import script_to_video
 from ScriptGen import generate_video_script
 
-app = FastAPI(title="StudyMate API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Loads the embedding model and pins the fixed job queries before the first request.
+    await asyncio.to_thread(precompute_queries, [SUMMARY_QUERY, FLASHCARD_QUERY])
+    if RERANK_ENABLED:
+        await asyncio.to_thread(get_reranker)
+    yield
+    await close_async_pool()
+
+app = FastAPI(title="StudyMate API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -38,7 +61,39 @@ app.add_middleware(
     expose_headers=["Content-Disposition"]
 )
 
-Embedding_Model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+metrics.register_collector("db_pool", pool_stats, "Sync database connection pool (ingestion and jobs).")
+metrics.register_collector("db_async_pool", async_pool_stats, "Async database connection pool (request handlers).")
+metrics.register_collector("query_embedding_cache", query_cache_stats, "Query embedding cache.")
+metrics.register_collector("answer_cache", answer_cache.stats, "Semantic answer cache.")
+metrics.register_collector("session_index_cache", session_index_cache.stats, "Per-session FAISS index cache.")
+metrics.register_collector("llm", gateway_stats, "LLM gateway calls, concurrency and prompt cache.")
+metrics.register_collector("ingest_jobs", job_counts, "Retained ingestion jobs by status.", label="status")
+
+def route_path(scope) -> str:
+    """The path template of the route serving the request, e.g. /jobs/{job_id}."""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Times every request and attributes the stages it runs (including work it hands to
+    threads and ingestion jobs) to its route. Streamed responses are timed to their start.
+    """
+    route = route_path(request.scope)
+    started = time.perf_counter()
+    status_code = 500
+
+    with metrics.pipeline(route):
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            metrics.observe_request(request.method, route, status_code, time.perf_counter() - started)
 
 class SignupRequest(BaseModel):
     full_name: str
@@ -49,9 +104,13 @@ class LoginRequest(BaseModel):
     email: EmailStr
     password: str
 
+RetrievalMode = Literal["vector", "hybrid"]
+
 class AskRequest(BaseModel):
     session_id: int
     question: str
+    retrieval_mode: Optional[RetrievalMode] = None
+    rerank: Optional[bool] = None
 
 class VideoRequest(BaseModel):
     session_id: int
@@ -75,22 +134,28 @@ def cleanup_file_and_dir(file_path: str, dir_path: str):
 async def test_api():
     return {"message": "Server is running fine"}
 
+@app.get("/metrics", status_code=status.HTTP_200_OK)
+async def get_metrics():
+    """Stage and request latency histograms plus pool and cache gauges, in the Prometheus text format."""
+    # Some collectors query the database with the sync pool.
+    return PlainTextResponse(await asyncio.to_thread(metrics.render), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/signup", status_code=status.HTTP_200_OK)
 async def signup_user(payload: SignupRequest):
     try:
-        with get_cursor() as cur:
+        async with get_async_cursor() as cur:
 
             full_name = payload.full_name.strip()
             first_name, last_name = (full_name.split(" ", 1) + [""])[:2]
 
-            cur.execute("SELECT user_id FROM user_login WHERE email = %s", (payload.email,))
-            existing_user = cur.fetchone()
+            await cur.execute("SELECT user_id FROM user_login WHERE email = %s", (payload.email,))
+            existing_user = await cur.fetchone()
             if existing_user:
                 raise HTTPException(status_code=400, detail="Email already registered")
 
-            hashed_pw = bcrypt.hashpw(payload.password.encode('utf-8'), bcrypt.gensalt())
+            hashed_pw = await asyncio.to_thread(bcrypt.hashpw, payload.password.encode('utf-8'), bcrypt.gensalt())
 
-            cur.execute(
+            await cur.execute(
                 """
                 INSERT INTO user_login (first_name, last_name, email, pwd, is_verified)
                 VALUES (%s, %s, %s, %s, %s)
@@ -99,9 +164,7 @@ async def signup_user(payload: SignupRequest):
                 (first_name, last_name, payload.email, hashed_pw.decode('utf-8'), False)
             )
 
-            user_id = cur.fetchone()[0]
-
-            cur.close()
+            user_id = (await cur.fetchone())[0]
 
             return {"message": "User registered successfully", "user_id": user_id}
 
@@ -114,22 +177,20 @@ async def signup_user(payload: SignupRequest):
 @app.post("/login", status_code=status.HTTP_200_OK)
 async def login_user(payload: LoginRequest):
     try:
-        with get_cursor() as cur:
-
-            cur.execute("SELECT user_id, pwd FROM user_login WHERE email = %s", (payload.email,))
-            user = cur.fetchone()
+        async with get_async_cursor() as cur:
 
-            if not user:
-                raise HTTPException(status_code=404, detail="User not found")
+            await cur.execute("SELECT user_id, pwd FROM user_login WHERE email = %s", (payload.email,))
+            user = await cur.fetchone()
 
-            user_id, stored_hashed_pw = user
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
 
-            if not bcrypt.checkpw(payload.password.encode('utf-8'), stored_hashed_pw.encode('utf-8')):
-                raise HTTPException(status_code=401, detail="Invalid credentials")
+        user_id, stored_hashed_pw = user
 
-            cur.close()
+        if not await asyncio.to_thread(bcrypt.checkpw, payload.password.encode('utf-8'), stored_hashed_pw.encode('utf-8')):
+            raise HTTPException(status_code=401, detail="Invalid credentials")
 
-            return {"message": "Login successful", "user_id": user_id}
+        return {"message": "Login successful", "user_id": user_id}
 
     except HTTPException as e:
         raise e
@@ -137,128 +198,133 @@ async def login_user(payload: LoginRequest):
         print("Login error:", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@app.post("/upload/", status_code=status.HTTP_200_OK)
+@app.post("/upload/", status_code=status.HTTP_202_ACCEPTED)
 async def upload_pdf(file: UploadFile, user_id: int, session_id: Optional[int] = None):
-    """Uploads a PDF, extracts text, embeds, and stores vectors using pgvector."""
-
-    print("Uploading document and generating vectors...")
+    """Saves the uploaded PDF and queues it for ingestion. Poll /jobs/{job_id} for the result."""
 
-    file_path = f"./uploads/{file.filename}"
     os.makedirs("uploads", exist_ok=True)
-    pdf_content_bytes = None
+    file_path = f"./uploads/{uuid.uuid4().hex}_{os.path.basename(file.filename)}"
 
     try:
         with open(file_path, "wb") as f:
             while chunk := await file.read(8192):
                 f.write(chunk)
 
-        text = read_scanned_pdf(file_path)
-        chunks = chunk_text(text, chunk_size=200, overlap=50)
-        vectors = embed_chunks(chunks)
+        job_id = await asyncio.to_thread(submit_ingestion, file_path, file.filename, user_id, session_id)
 
-        with open(file_path, "rb") as f:
-            pdf_content_bytes = f.read()
+    except Exception as e:
+        print(f"Upload process failed: {e}")
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"The document upload failed: {e}"
+        )
 
-        with get_cursor() as cur:
-            cur.execute(
-                "INSERT INTO document (document_title, pdf_content, user_id) VALUES (%s, %s, %s) RETURNING document_id;",
-                (file.filename, pdf_content_bytes, user_id)
-            )
-            documentResult = cur.fetchone()
-            document_id = documentResult[0]
-
-            data_to_insert = [
-                (document_id, i, chunks[i], vector.tolist())
-                for i, vector in enumerate(vectors)
-            ]
-            insert_query = """
-                INSERT INTO embeddings (document_id, chunk_index, chunk_text, embedding) 
-                VALUES (%s, %s, %s, %s);
-            """
-            cur.executemany(insert_query, data_to_insert)
-
-            print("All vectors uploaded successfully.")
-
-            session_name = generate_session_name(file.filename)
-            session_exists = False
-            if(session_id is None):
-
-                cur.execute(
-                    "INSERT INTO sessions (user_id, session_name) VALUES (%s, %s) RETURNING session_id;",
-                    (user_id, session_name)
-                )
-                sessionResult = cur.fetchone()
+    print(f"Document queued for ingestion as job {job_id}")
 
-                if not sessionResult:
-                    raise Exception("Failed to retrieve session ID.")
+    return {
+        "message": "Document accepted for processing",
+        "job_id": job_id,
+        "status": "queued"
+    }
 
-                session_id = sessionResult[0]
-                session_exists = True
-                print(f"Session created with ID: {session_id}")
+@app.get("/jobs/{job_id}", status_code=status.HTTP_200_OK)
+async def get_ingestion_job(job_id: str):
+    """Returns the stage, progress and (once completed) result of an ingestion job."""
 
-            else:
-                cur.execute(
-                    "SELECT EXISTS(SELECT 1 FROM sessions WHERE session_id = %s);",
-                    (session_id,)
-                )
-                session_exists = cur.fetchone()[0]
-
-            if session_exists:
-                cur.execute(
-                    "INSERT INTO sessiondocuments (session_id, document_id) VALUES (%s, %s) RETURNING id;",
-                    (session_id, document_id)
-                )
-
-                sessionDocumentResult = cur.fetchone()
-                sessionDoc_id = sessionDocumentResult[0]
-                print(f"SessionDocument entry created with ID: {sessionDoc_id}")
+    job = await get_job_async(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} not found."
+        )
 
-                if not sessionDocumentResult:
-                    raise Exception("Failed to create sessionDocument entry after session creation.")
+    return job
 
-            else:
-                raise Exception(f"Provided session ID {session_id} is not found in the database.")
+CHAT_HISTORY_PAGE_SIZE = 50
+CHAT_HISTORY_MAX_PAGE_SIZE = 200
 
+def encode_history_cursor(created_at: datetime, message_id: int) -> str:
+    """Opaque keyset cursor for the chat message at (created_at, message_id)."""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{message_id}".encode()).decode()
 
+def decode_history_cursor(cursor: str):
+    try:
+        created_at, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(message_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid chat history cursor.")
 
-            return {
-                "message": "Document uploaded and processed successfully",
-                "document_id": document_id,
-                "session_id": session_id,
-                "session_name": session_name
-            }
-
+@app.get("/retrieveChatHistory/", status_code=status.HTTP_200_OK)
+async def retrieve_chat_history(
+    session_id: int,
+    limit: int = Query(CHAT_HISTORY_PAGE_SIZE, ge=1, le=CHAT_HISTORY_MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None
+):
+    """
+    Returns one page of the session's chat history in chronological order. Without a
+    cursor it returns the latest `limit` messages; `before` pages towards older messages
+    and `after` fetches messages newer than the cursor. `next_cursor` continues in the
+    same direction (None once no older messages remain).
+    """
 
-    except Exception as e:
-        print(f"Upload process failed: {e}")
+    if before and after:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"The document upload or processing failed: {e}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass either before or after, not both."
         )
 
-    finally:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            print(f"Successfully removed temporary file: {file_path}")
-
-@app.get("/retrieveChatHistory/", status_code=status.HTTP_200_OK)
-async def retrieve_chat_history(session_id: int):
-    """Handles chat interaction and remembers conversation history."""
-
+    ChatHistory = []
+    has_more = False
+    next_cursor = after
     try:
-        with get_cursor() as cur:
-            cur.execute(
+        async with get_async_cursor() as cur:
+            await cur.execute(
                     "SELECT EXISTS(SELECT 1 FROM sessions WHERE session_id = %s);",
                     (session_id,)
                 )
-            session_exists = cur.fetchone()
+            session_exists = await cur.fetchone()
             if session_exists and session_exists[0]:
-                cur.execute(
-                    "SELECT sender, message, created_at FROM chat_history WHERE session_id = %s;",
-                    (session_id,)
-                )
-                ChatHistory = cur.fetchall()
+                if after:
+                    await cur.execute(
+                        "SELECT message_id, sender, message, created_at FROM chat_history "
+                        "WHERE session_id = %s AND (created_at, message_id) > (%s, %s) "
+                        "ORDER BY created_at, message_id LIMIT %s;",
+                        (session_id, *decode_history_cursor(after), limit + 1)
+                    )
+                    rows = await cur.fetchall()
+                elif before:
+                    await cur.execute(
+                        "SELECT message_id, sender, message, created_at FROM chat_history "
+                        "WHERE session_id = %s AND (created_at, message_id) < (%s, %s) "
+                        "ORDER BY created_at DESC, message_id DESC LIMIT %s;",
+                        (session_id, *decode_history_cursor(before), limit + 1)
+                    )
+                    rows = (await cur.fetchall())[::-1]
+                else:
+                    await cur.execute(
+                        "SELECT message_id, sender, message, created_at FROM chat_history "
+                        "WHERE session_id = %s "
+                        "ORDER BY created_at DESC, message_id DESC LIMIT %s;",
+                        (session_id, limit + 1)
+                    )
+                    rows = (await cur.fetchall())[::-1]
+
+                has_more = len(rows) > limit
+                if after:
+                    rows = rows[:limit]
+                    if rows:
+                        next_cursor = encode_history_cursor(rows[-1][3], rows[-1][0])
+                else:
+                    rows = rows[-limit:]
+                    next_cursor = encode_history_cursor(rows[0][3], rows[0][0]) if has_more else None
+
+                ChatHistory = [(sender, message, created_at) for _, sender, message, created_at in rows]
 
+    except HTTPException as e:
+        raise e
     except Exception as db_error:
         print(f"Database operation failed: {db_error}")
         raise HTTPException(
@@ -266,10 +332,60 @@ async def retrieve_chat_history(session_id: int):
             detail=f"A database operation failed (e.g., connection or insertion error): {db_error}"
         )
 
-    return {"response": ChatHistory}
+    return {"response": ChatHistory, "has_more": has_more, "next_cursor": next_cursor}
+
+async def prepare_ask_context(session_id: int, question: str, k_chunks: int, retrieval_mode: Optional[str] = None,
+                              rerank: Optional[bool] = None):
+    """
+    Embeds the question and loads the chat memory (running summary plus recent messages),
+    the session's document ids and the top-k chunks in one connection checkout. Vector
+    retrieval is served from the session's cached FAISS index, which is loaded from the
+    database on first use; sessions too large for the cache are searched in SQL. With rerank, a larger candidate set is retrieved and narrowed
+    to k_chunks by the cross-encoder.
+    """
+    rerank = RERANK_ENABLED if rerank is None else rerank
+    k_candidates = candidate_count(k_chunks) if rerank else k_chunks
+
+    with metrics.time_stage("embed"):
+        query_embedding = await asyncio.to_thread(encode_query, question)
+
+    async with get_async_cursor() as cur:
+        with metrics.time_stage("history"):
+            summary, history = await load_chat_memory_async(cur, session_id)
+
+        with metrics.time_stage("retrieve"):
+            document_ids = await get_session_document_ids_async(cur, session_id)
+            mode = resolve_retrieval_mode(retrieval_mode)
+            session_index = await get_session_index_async(session_id, document_ids) if mode == "vector" else None
+            if session_index is not None:
+                chunks = session_index.search(query_embedding, k_candidates)
+            else:
+                # Hybrid retrieval, or a session too large for the FAISS cache.
+                chunks = await search_session_chunks_async(
+                    cur, session_id, query_embedding, k_candidates, mode=mode, query_text=question
+                )
+
+    if rerank:
+        with metrics.time_stage("rerank"):
+            chunks = await asyncio.to_thread(rerank_chunks, question, chunks, k_chunks)
+
+    context_text = join_chunks(chunks)
+
+    if not context_text:
+        print(f"Warning: RAG query returned 0 chunks for session ID {session_id}.")
+
+    return query_embedding, document_ids, chunks, history, summary, context_text
+
+async def save_chat_turn(session_id: int, question: str, response: str):
+    with metrics.time_stage("insert"):
+        async with get_async_cursor() as cur:
+            await cur.executemany(
+                "INSERT INTO chat_history (session_id, sender, message) VALUES (%s, %s, %s);",
+                [(session_id, 'User', question), (session_id, 'Bot', response)]
+            )
 
 @app.post("/ask/", status_code=status.HTTP_200_OK)
-async def ask_question_refactored(request: AskRequest):
+async def ask_question_refactored(request: AskRequest, background_tasks: BackgroundTasks):
     """
     Handles chat interaction, remembers conversation history, and uses
     efficient, database-native RAG context retrieval.
@@ -279,86 +395,101 @@ async def ask_question_refactored(request: AskRequest):
     k_chunks = 3
 
     try:
-        with get_cursor() as cur:
-            cur.execute(
-                    "SELECT EXISTS(SELECT 1 FROM sessions WHERE session_id = %s);",
-                    (session_id,)
-                )
-            session_exists = cur.fetchone()
-
-            if not (session_exists and session_exists[0]):
-                pass
-
-            cur.execute(
-                "SELECT sender, message FROM chat_history WHERE session_id = %s ORDER BY created_at ASC;",
-                (session_id,)
-            )
-
-            chat_history = cur.fetchall()
+        query_embedding, document_ids, chunks, history, summary, context_text = await prepare_ask_context(
+            session_id, question, k_chunks, request.retrieval_mode, request.rerank
+        )
 
-            formatted_lines = [f"{entry[0]}: {entry[1]}" for entry in chat_history]
-            history = "\n".join(formatted_lines)
+        chunk_ids = [chunk.embed_id for chunk in chunks]
+        response = answer_cache.get(document_ids, query_embedding, chunk_ids, summary, history) if context_text else None
 
-            query_vector = Embedding_Model.encode(
-                [question],
-                convert_to_numpy=True,
-                normalize_embeddings=True
-            ).astype("float32")
-            query_embedding = query_vector[0].tolist()
-            query_vector_string = '[' + ','.join(map(str, query_embedding)) + ']'
+        if response is None:
+            # The LLM call runs without holding a pooled connection.
+            with metrics.time_stage("generate"):
+                response = await agenerate_response(question, context_text, history, summary)
+            if context_text:
+                answer_cache.put(document_ids, query_embedding, chunk_ids, response, summary, history)
+        else:
+            print(f"Answer cache hit for session ID {session_id}.")
 
-            sql_query = """
-                SELECT  e.chunk_text 
-                FROM embeddings e
-                LEFT JOIN sessiondocuments s on s.document_id = e.document_id 
-                WHERE  s.session_id = %s 
-                ORDER BY e.embedding <=> %s::vector
-                LIMIT %s;
-            """
-            cur.execute(sql_query, (session_id, query_vector_string, k_chunks))
-            chunks = cur.fetchall()
+        await save_chat_turn(session_id, question, response)
+        background_tasks.add_task(update_session_memory, session_id)
 
-            context_text = "\n\n---\n\n".join([row[0] for row in chunks if isinstance(row, tuple) and len(row) > 0])
+        return {"response": response}
 
-            if not context_text:
-                print(f"Warning: RAG query returned 0 chunks for session ID {session_id}.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return {"response": f"Sorry, an internal error occurred while processing your request.: {e}"}
 
-            response = generate_response(question, context_text, history)
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-            cur.execute(
-                "INSERT INTO chat_history (session_id, sender, message) VALUES (%s, %s, %s);",
-                (session_id, 'User', question)
-            )
+@app.post("/ask/stream", status_code=status.HTTP_200_OK)
+async def ask_question_stream(request: AskRequest, background_tasks: BackgroundTasks):
+    """
+    Streaming variant of /ask/: sends the answer as Server-Sent Events ("token" events
+    carrying text pieces, then a final "done" event with the full response) and stores
+    the chat turn once generation completes. The running summary is updated after the
+    stream ends.
+    """
+    session_id = request.session_id
+    question = request.question
+    k_chunks = 3
 
-            cur.execute(
-                "INSERT INTO chat_history (session_id, sender, message) VALUES (%s, %s, %s);",
-                (session_id, 'Bot', response)
+    async def event_stream():
+        try:
+            query_embedding, document_ids, chunks, history, summary, context_text = await prepare_ask_context(
+                session_id, question, k_chunks, request.retrieval_mode, request.rerank
             )
 
-            return {"response": response}
-
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return {"response": f"Sorry, an internal error occurred while processing your request.: {e}"}
+            chunk_ids = [chunk.embed_id for chunk in chunks]
+            response = answer_cache.get(document_ids, query_embedding, chunk_ids, summary, history) if context_text else None
 
-        print(f"An error occurred: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"An error occurred: {e}"
-        )
+            if response is not None:
+                print(f"Answer cache hit for session ID {session_id}.")
+                yield sse_event("token", {"text": response})
+            else:
+                pieces = []
+                generate_started = time.perf_counter()
+                async for piece in astream_response(question, context_text, history, summary):
+                    if not pieces:
+                        metrics.observe_stage("first_token", time.perf_counter() - generate_started)
+                    pieces.append(piece)
+                    yield sse_event("token", {"text": piece})
+                metrics.observe_stage("generate", time.perf_counter() - generate_started)
+
+                response = "".join(pieces)
+                if context_text:
+                    answer_cache.put(document_ids, query_embedding, chunk_ids, response, summary, history)
+
+            await save_chat_turn(session_id, question, response)
+            yield sse_event("done", {"response": response})
+
+        except Exception as e:
+            print(f"An error occurred while streaming: {e}")
+            yield sse_event("error", {"detail": f"Sorry, an internal error occurred while processing your request.: {e}"})
+
+    background_tasks.add_task(update_session_memory, session_id)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks
+    )
 
 @app.get("/getDocumentsBySession", status_code=status.HTTP_200_OK)
 async def getSessionFiles(session_id: int):
 
+    document_titles = []
     try:
-        with get_cursor() as cur:
-            cur.execute(
+        async with get_async_cursor() as cur:
+            await cur.execute(
                     "SELECT EXISTS(SELECT 1 FROM sessions WHERE session_id = %s);",
                     (session_id,)
                 )
-            session_exists = cur.fetchone()
+            session_exists = await cur.fetchone()
             if session_exists and session_exists[0]:
-                cur.execute(
+                await cur.execute(
                     "SELECT d.document_title  "
                     "FROM sessions s "
                     "LEFT JOIN sessiondocuments sd ON sd.session_id = s.session_id "
@@ -366,7 +497,7 @@ async def getSessionFiles(session_id: int):
                     "WHERE s.session_id = %s;",
                     (session_id,)
                 )
-                document_titles = cur.fetchall()
+                document_titles = await cur.fetchall()
 
     except Exception as db_error:
         print(f"Database operation failed: {db_error}")
@@ -380,21 +511,22 @@ async def getSessionFiles(session_id: int):
 @app.get("/getSessionsByUserId", status_code=status.HTTP_200_OK)
 async def getSessions(user_id: int):
 
+    session_data = []
     try:
-        with get_cursor() as cur:
-            cur.execute(
+        async with get_async_cursor() as cur:
+            await cur.execute(
                     "SELECT EXISTS(SELECT 1 FROM user_login WHERE user_id = %s);",
                     (user_id,)
                 )
-            session_exists = cur.fetchone()
+            session_exists = await cur.fetchone()
             if session_exists and session_exists[0]:
-                cur.execute(
+                await cur.execute(
                     "SELECT s.session_id, s.session_name  "
                     "FROM sessions s "
                     "WHERE s.user_id = %s;",
                     (user_id,)
                 )
-                session_data = cur.fetchall()
+                session_data = await cur.fetchall()
 
 
     except Exception as db_error:
@@ -440,10 +572,11 @@ async def generate_audio_lesson(session_id: int):
         )
 
 @app.get("/generateSessionSummary", status_code=status.HTTP_200_OK)
-async def generate_session_summary(session_id: int):
+async def generate_session_summary(session_id: int, retrieval_mode: Optional[RetrievalMode] = None):
 
     try:
-        pdf_path = Summarizer_main(session_id)
+        # The job makes blocking DB and LLM calls, so it runs off the event loop.
+        pdf_path = await asyncio.to_thread(Summarizer_main, session_id, retrieval_mode)
 
         file_name = os.path.basename(pdf_path)
         temp_dir = os.path.dirname(pdf_path)
@@ -461,7 +594,7 @@ async def generate_session_summary(session_id: int):
         )
 
 @app.get("/generateFlashcards", status_code=status.HTTP_200_OK, response_model=List[Dict])
-async def generate_session_flashcards(session_id: int):
+async def generate_session_flashcards(session_id: int, retrieval_mode: Optional[RetrievalMode] = None):
     """
     Triggers the RAG pipeline to generate a list of question-and-answer flashcards
     for a specified session ID.
@@ -476,9 +609,11 @@ async def generate_session_flashcards(session_id: int):
     try:
         print(f"Starting Flashcards job for session ID: {session_id}")
 
-        flashcards_list = run_flashcard_job(
+        flashcards_list = await asyncio.to_thread(
+            run_flashcard_job,
             session_id=session_id,
-            db_connection_service=db_connection
+            db_connection_service=db_connection,
+            retrieval_mode=retrieval_mode
         )
 
         return flashcards_list
@@ -502,7 +637,7 @@ async def generate_video(request: VideoRequest):
     """
     try:
 
-        json_slides = generate_video_script(request.session_id)
+        json_slides = await asyncio.to_thread(generate_video_script, request.session_id)
 
         if not json_slides.strip().startswith("["):
             json_slides = f"[{json_slides}]"
@@ -519,9 +654,9 @@ async def generate_video(request: VideoRequest):
 
         # output_dir = os.path.dirname(final_video_path)
 
-        with get_cursor() as cur:
-            cur.execute("SELECT s.session_name FROM sessions s WHERE s.session_id = %s;", (request.session_id,))
-            session_name = cur.fetchone()
+        async with get_async_cursor() as cur:
+            await cur.execute("SELECT s.session_name FROM sessions s WHERE s.session_id = %s;", (request.session_id,))
+            session_name = await cur.fetchone()
 
         return FileResponse(
             path=final_video_path,
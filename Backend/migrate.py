@@ -0,0 +1,43 @@
+import glob
+import os
+
+from dbconnect import get_cursor
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+def apply_migrations():
+    """
+    Applies every migrations/NNN_*.sql file that is not yet recorded in
+    schema_migrations, in filename order, each in its own transaction.
+    """
+    with get_cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version varchar(255) PRIMARY KEY,
+                applied_at timestamp DEFAULT now() NOT NULL
+            );
+            """
+        )
+        cur.execute("SELECT version FROM schema_migrations;")
+        applied = {row[0] for row in cur.fetchall()}
+
+    for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, "*.sql"))):
+        version = os.path.splitext(os.path.basename(path))[0]
+        if version in applied:
+            continue
+
+        with open(path) as f:
+            sql = f.read()
+
+        print(f"Applying migration {version}...")
+        with get_cursor() as cur:
+            cur.execute(sql)
+            cur.execute("INSERT INTO schema_migrations (version) VALUES (%s);", (version,))
+
+    print("Database schema is up to date.")
+
+
+if __name__ == "__main__":
+    apply_migrations()
@@ -0,0 +1,7 @@
+-- Content hash used to reuse the chunks and embeddings of identical uploads.
+
+ALTER TABLE "document" ADD COLUMN IF NOT EXISTS content_hash char(64) NULL;
+
+UPDATE "document" SET content_hash = encode(sha256(pdf_content), 'hex') WHERE content_hash IS NULL;
+
+CREATE INDEX IF NOT EXISTS document_content_hash_idx ON "document" (content_hash);
@@ -0,0 +1,15 @@
+-- Indexes for session-scoped vector search and chat history reads.
+
+-- all-MiniLM-L6-v2 produces 384-dimensional vectors; HNSW requires a fixed dimension.
+ALTER TABLE embeddings ALTER COLUMN embedding TYPE vector(384);
+
+CREATE INDEX IF NOT EXISTS embeddings_embedding_hnsw_idx
+    ON embeddings USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+
+CREATE INDEX IF NOT EXISTS embeddings_document_id_chunk_index_idx ON embeddings (document_id, chunk_index);
+
+-- sessiondocuments (session_id, document_id) is already indexed by its unique constraint;
+-- this covers lookups from a document back to its sessions.
+CREATE INDEX IF NOT EXISTS sessiondocuments_document_id_idx ON sessiondocuments (document_id);
+
+CREATE INDEX IF NOT EXISTS chat_history_session_id_created_at_idx ON chat_history (session_id, created_at);
@@ -0,0 +1,51 @@
+-- Session-scoped copy of each embedding so per-session top-k search reads only that
+-- session's rows through the primary key instead of joining through sessiondocuments.
+-- Rows are maintained by a trigger on sessiondocuments; run backfill_session_embeddings.py
+-- once after applying this migration to populate existing sessions.
+
+CREATE TABLE IF NOT EXISTS session_embeddings (
+    session_id int4 NOT NULL,
+    embed_id int4 NOT NULL,
+    document_id int4 NOT NULL,
+    embedding vector(384) NOT NULL,
+    CONSTRAINT session_embeddings_pkey PRIMARY KEY (session_id, embed_id),
+    CONSTRAINT session_embeddings_session_id_fkey FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE,
+    CONSTRAINT session_embeddings_embed_id_fkey FOREIGN KEY (embed_id) REFERENCES embeddings(embed_id) ON DELETE CASCADE
+) PARTITION BY HASH (session_id);
+
+DO $$
+BEGIN
+    FOR i IN 0..15 LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS session_embeddings_p%s PARTITION OF session_embeddings FOR VALUES WITH (MODULUS 16, REMAINDER %s);',
+            i, i
+        );
+    END LOOP;
+END;
+$$;
+
+CREATE INDEX IF NOT EXISTS session_embeddings_embed_id_idx ON session_embeddings (embed_id);
+
+CREATE OR REPLACE FUNCTION sync_session_embeddings() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO session_embeddings (session_id, embed_id, document_id, embedding)
+        SELECT NEW.session_id, e.embed_id, e.document_id, e.embedding
+        FROM embeddings e
+        WHERE e.document_id = NEW.document_id AND e.embedding IS NOT NULL
+        ON CONFLICT DO NOTHING;
+        RETURN NEW;
+    END IF;
+
+    DELETE FROM session_embeddings WHERE session_id = OLD.session_id AND document_id = OLD.document_id;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sessiondocuments_sync_session_embeddings ON sessiondocuments;
+CREATE TRIGGER sessiondocuments_sync_session_embeddings
+    AFTER INSERT OR DELETE ON sessiondocuments
+    FOR EACH ROW EXECUTE FUNCTION sync_session_embeddings();
+
+-- Retrieval no longer searches embeddings globally, so the HNSW index only slows down ingestion.
+DROP INDEX IF EXISTS embeddings_embedding_hnsw_idx;
@@ -0,0 +1,8 @@
+-- Stored full-text vector over chunk_text for the lexical half of hybrid retrieval.
+-- Adding a stored generated column rewrites the embeddings table once.
+
+ALTER TABLE embeddings
+    ADD COLUMN IF NOT EXISTS chunk_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(chunk_text, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS embeddings_chunk_tsv_idx ON embeddings USING gin (chunk_tsv);
@@ -0,0 +1,12 @@
+-- Running summary of each session's older chat turns. The /ask/ prompt carries this
+-- summary plus only the most recent turns; summarized_through is the message_id of the
+-- last chat_history row folded into the summary.
+
+CREATE TABLE IF NOT EXISTS session_memory (
+    session_id int4 NOT NULL,
+    summary text DEFAULT '' NOT NULL,
+    summarized_through int4 DEFAULT 0 NOT NULL,
+    updated_at timestamp DEFAULT now() NOT NULL,
+    CONSTRAINT session_memory_pkey PRIMARY KEY (session_id),
+    CONSTRAINT session_memory_session_id_fkey FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+);
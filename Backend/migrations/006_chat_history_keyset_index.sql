@@ -0,0 +1,7 @@
+-- Composite index for keyset pagination of /retrieveChatHistory/ on (created_at, message_id);
+-- it also serves every query the older (session_id, created_at) index did.
+
+CREATE INDEX IF NOT EXISTS chat_history_session_id_created_at_message_id_idx
+    ON chat_history (session_id, created_at, message_id);
+
+DROP INDEX IF EXISTS chat_history_session_id_created_at_idx;
@@ -0,0 +1,30 @@
+-- Ingestion job state shared by every server worker and kept across restarts, so a
+-- /jobs/{job_id} poll can land on any worker.
+
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    job_id char(32) NOT NULL,
+    status varchar(16) DEFAULT 'queued' NOT NULL,
+    stage varchar(32) DEFAULT 'queued' NOT NULL,
+    progress real DEFAULT 0 NOT NULL,
+    pages_done int4 DEFAULT 0 NOT NULL,
+    page_count int4 NULL,
+    chunks_embedded int4 DEFAULT 0 NOT NULL,
+    deduplicated bool DEFAULT false NOT NULL,
+    result jsonb NULL,
+    error text NULL,
+    created_at timestamp DEFAULT now() NOT NULL,
+    updated_at timestamp DEFAULT now() NOT NULL,
+    CONSTRAINT ingest_jobs_pkey PRIMARY KEY (job_id)
+);
+
+CREATE INDEX IF NOT EXISTS ingest_jobs_status_updated_at_idx ON ingest_jobs (status, updated_at);
+
+-- A document's embeddings are written in several short transactions. embedded_at is set
+-- once they are complete; until then ingest_job_id names the job writing them, so an
+-- identical upload can wait for that job instead of holding a lock for the whole ingestion.
+ALTER TABLE "document" ADD COLUMN IF NOT EXISTS embedded_at timestamp NULL;
+ALTER TABLE "document" ADD COLUMN IF NOT EXISTS ingest_job_id char(32) NULL;
+
+UPDATE "document" d SET embedded_at = now()
+WHERE d.embedded_at IS NULL
+  AND EXISTS (SELECT 1 FROM embeddings e WHERE e.document_id = d.document_id);
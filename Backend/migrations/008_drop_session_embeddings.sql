@@ -0,0 +1,13 @@
+-- Session-scoped vector search goes back to a semi-join on document_id over embeddings
+-- (see Retrieval.py). The planner serves it from the HNSW index with iterative scans, or
+-- from the (document_id, chunk_index) btree followed by an exact sort for small sessions.
+-- Without its own vector index, session_embeddings read the same embeddings rows while
+-- its trigger and partitions added write cost to every session link.
+
+DROP TRIGGER IF EXISTS sessiondocuments_sync_session_embeddings ON sessiondocuments;
+DROP FUNCTION IF EXISTS sync_session_embeddings();
+DROP TABLE IF EXISTS session_embeddings;
+
+-- 003 dropped the HNSW index from 002; the semi-join uses it again.
+CREATE INDEX IF NOT EXISTS embeddings_embedding_hnsw_idx
+    ON embeddings USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
@@ -0,0 +1,39 @@
+-- Every upload gets its own document row carrying its title and uploader. An upload whose
+-- bytes were already embedded stores no second copy: content_document_id points at the
+-- document holding the pdf_content and embeddings, and session_chunk_documents resolves a
+-- session's documents to the ones holding their chunks.
+
+ALTER TABLE "document" ADD COLUMN IF NOT EXISTS content_document_id int4 NULL;
+ALTER TABLE "document" DROP CONSTRAINT IF EXISTS document_content_document_id_fkey;
+ALTER TABLE "document" ADD CONSTRAINT document_content_document_id_fkey
+    FOREIGN KEY (content_document_id) REFERENCES "document"(document_id);
+CREATE INDEX IF NOT EXISTS document_content_document_id_idx ON "document" (content_document_id);
+
+ALTER TABLE "document" ALTER COLUMN pdf_content DROP NOT NULL;
+ALTER TABLE "document" ALTER COLUMN user_id DROP NOT NULL;
+
+-- A document other uploads share outlives its uploader. Deleting a user removes their own
+-- uploads and the documents nobody else shares; shared ones only lose their user_id.
+ALTER TABLE "document" DROP CONSTRAINT IF EXISTS fk_user;
+ALTER TABLE "document" ADD CONSTRAINT fk_user
+    FOREIGN KEY (user_id) REFERENCES user_login(user_id) ON DELETE SET NULL;
+
+CREATE OR REPLACE FUNCTION delete_unshared_user_documents() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM "document" WHERE user_id = OLD.user_id AND content_document_id IS NOT NULL;
+    DELETE FROM "document" d
+    WHERE d.user_id = OLD.user_id
+      AND NOT EXISTS (SELECT 1 FROM "document" s WHERE s.content_document_id = d.document_id);
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_login_delete_unshared_documents ON user_login;
+CREATE TRIGGER user_login_delete_unshared_documents
+    BEFORE DELETE ON user_login
+    FOR EACH ROW EXECUTE FUNCTION delete_unshared_user_documents();
+
+CREATE OR REPLACE VIEW session_chunk_documents AS
+SELECT DISTINCT sd.session_id, COALESCE(d.content_document_id, d.document_id) AS document_id
+FROM sessiondocuments sd
+JOIN "document" d ON d.document_id = sd.document_id;
@@ -231,9 +231,23 @@ function normalizeSessionHistory(raw: unknown): SessionChatHistory | null {
   };
 }
 
+export interface ChatHistoryPage {
+  messages: ChatMessage[];
+  /** Cursor of the next older page, or null once the oldest message is loaded. */
+  nextCursor: string | null;
+}
+
+const CHAT_HISTORY_PAGE_LIMIT = 50;
+
+/**
+ * Loads one page of a session's chat history: the latest messages, or with `before`
+ * the messages preceding that cursor. Older pages are only requested when the user
+ * asks for them, so opening a chat never downloads its whole history.
+ */
 export async function fetchChatHistory(
-  sessionId: number
-): Promise<ChatMessage[]> {
+  sessionId: number,
+  before?: string | null
+): Promise<ChatHistoryPage> {
   if (!Number.isFinite(sessionId)) {
     throw new Error("A valid session id is required to load chat history.");
   }
@@ -249,7 +263,12 @@ export async function fetchChatHistory(
 
   for (const url of candidates) {
     try {
-      const response = await fetch(url);
+      const separator = url.includes("?") ? "&" : "?";
+      const pageUrl = before
+        ? `${url}${separator}limit=${CHAT_HISTORY_PAGE_LIMIT}&before=${encodeURIComponent(before)}`
+        : `${url}${separator}limit=${CHAT_HISTORY_PAGE_LIMIT}`;
+
+      const response = await fetch(pageUrl);
       if (!response.ok) {
         errors.push(`${url} → ${response.status}`);
         continue;
@@ -262,9 +281,25 @@ export async function fetchChatHistory(
         continue;
       }
 
-      return entries
+      const record =
+        payload && typeof payload === "object"
+          ? (payload as Record<string, unknown>)
+          : {};
+      const cursor = record.next_cursor;
+      const nextCursor =
+        record.has_more === true && typeof cursor === "string" && cursor
+          ? cursor
+          : null;
+
+      // Entry indexes restart on every page, so older pages get their own id prefix.
+      const messages = entries
         .map(normalizeMessageEntry)
-        .filter((item): item is ChatMessage => item !== null);
+        .filter((item): item is ChatMessage => item !== null)
+        .map((message) =>
+          before ? { ...message, id: `before-${before}-${message.id}` } : message
+        );
+
+      return { messages, nextCursor };
     } catch (error) {
       errors.push(`${url} → ${(error as Error).message}`);
     }
@@ -276,7 +311,7 @@ export async function fetchChatHistory(
     );
   }
 
-  return [];
+  return { messages: [], nextCursor: null };
 }
 
 export async function fetchChatHistoriesForUser(
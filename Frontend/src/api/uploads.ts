@@ -7,16 +7,72 @@ export interface UploadDocumentResult {
   session_name: string;
 }
 
+export interface UploadJobStatus {
+  job_id: string;
+  status: "queued" | "running" | "completed" | "failed";
+  stage: string;
+  progress: number;
+  result: UploadDocumentResult | null;
+  error: string | null;
+}
+
 interface UploadDocumentArgs {
   file: File;
   userId: number;
   sessionId?: number | string;
+  onProgress?: (status: UploadJobStatus) => void;
+}
+
+const JOB_POLL_INTERVAL_MS = 1500;
+
+async function readErrorMessage(response: Response, fallback: string) {
+  try {
+    const errorBody = await response.json();
+    if (typeof errorBody?.detail === "string") {
+      return errorBody.detail;
+    }
+  } catch {
+    // ignore JSON parse errors and fall back to default message
+  }
+  return fallback;
+}
+
+async function waitForUploadJob(
+  jobId: string,
+  onProgress?: (status: UploadJobStatus) => void
+): Promise<UploadDocumentResult> {
+  const url = `${API_BASE_URL}/jobs/${encodeURIComponent(jobId)}`;
+
+  for (;;) {
+    const response = await fetch(url);
+    if (!response.ok) {
+      throw new Error(
+        await readErrorMessage(
+          response,
+          `Checking upload status failed with status ${response.status}.`
+        )
+      );
+    }
+
+    const job = (await response.json()) as UploadJobStatus;
+    onProgress?.(job);
+
+    if (job.status === "completed" && job.result) {
+      return job.result;
+    }
+    if (job.status === "failed") {
+      throw new Error(job.error ?? "The document upload or processing failed.");
+    }
+
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+  }
 }
 
 export async function uploadDocument({
   file,
   userId,
   sessionId,
+  onProgress,
 }: UploadDocumentArgs): Promise<UploadDocumentResult> {
   if (!Number.isFinite(userId)) {
     throw new Error("A valid numeric user id is required for uploads.");
@@ -37,18 +93,14 @@ export async function uploadDocument({
   });
 
   if (!response.ok) {
-    let message = `Upload failed with status ${response.status}.`;
-    try {
-      const errorBody = await response.json();
-      if (typeof errorBody?.detail === "string") {
-        message = errorBody.detail;
-      }
-    } catch {
-      // ignore JSON parse errors and fall back to default message
-    }
-    throw new Error(message);
+    throw new Error(
+      await readErrorMessage(
+        response,
+        `Upload failed with status ${response.status}.`
+      )
+    );
   }
 
-  const payload = (await response.json()) as UploadDocumentResult;
-  return payload;
+  const { job_id: jobId } = (await response.json()) as { job_id: string };
+  return waitForUploadJob(jobId, onProgress);
 }
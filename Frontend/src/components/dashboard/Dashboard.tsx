@@ -421,6 +421,11 @@ export default function Dashboard() {
     Record<number, ChatMessage[]>
   >({});
   const [chatLoading, setChatLoading] = React.useState(false);
+  // Cursor of the next older history page per session; null once fully loaded.
+  const [historyCursorBySession, setHistoryCursorBySession] = React.useState<
+    Record<number, string | null>
+  >({});
+  const [loadingEarlier, setLoadingEarlier] = React.useState(false);
   const [chatError, setChatError] = React.useState<string | null>(null);
   const [chatInput, setChatInput] = React.useState("");
   const [isThinking, setIsThinking] = React.useState(false);
@@ -444,6 +449,11 @@ export default function Dashboard() {
     React.useState<NotesBySession>(loadNotesFromStorage);
 
   const chatContainerRef = React.useRef<HTMLDivElement | null>(null);
+  // Scroll position saved before older messages are prepended, so the view stays put.
+  const scrollAnchorRef = React.useRef<{
+    scrollHeight: number;
+    scrollTop: number;
+  } | null>(null);
   const fileInputRef = React.useRef<HTMLInputElement | null>(null);
 
   React.useEffect(() => {
@@ -566,10 +576,14 @@ export default function Dashboard() {
     setChatError(null);
 
     fetchChatHistory(selectedSessionId)
-      .then((history) => {
+      .then((page) => {
         setMessagesBySession((prev) => ({
           ...prev,
-          [selectedSessionId]: sortMessagesByTimestamp(history),
+          [selectedSessionId]: sortMessagesByTimestamp(page.messages),
+        }));
+        setHistoryCursorBySession((prev) => ({
+          ...prev,
+          [selectedSessionId]: page.nextCursor,
         }));
       })
       .catch((error) => {
@@ -588,11 +602,60 @@ export default function Dashboard() {
     [messagesBySession, selectedSessionId]
   );
 
+  const earlierCursor =
+    selectedSessionId != null
+      ? historyCursorBySession[selectedSessionId] ?? null
+      : null;
+
+  const handleLoadEarlierMessages = React.useCallback(async () => {
+    if (selectedSessionId === null || !earlierCursor || loadingEarlier) {
+      return;
+    }
+
+    const sessionId = selectedSessionId;
+    const container = chatContainerRef.current;
+    scrollAnchorRef.current = container
+      ? { scrollHeight: container.scrollHeight, scrollTop: container.scrollTop }
+      : null;
+
+    setLoadingEarlier(true);
+    setChatError(null);
+
+    try {
+      const page = await fetchChatHistory(sessionId, earlierCursor);
+      setMessagesBySession((prev) => ({
+        ...prev,
+        [sessionId]: sortMessagesByTimestamp([
+          ...page.messages,
+          ...(prev[sessionId] ?? []),
+        ]),
+      }));
+      setHistoryCursorBySession((prev) => ({
+        ...prev,
+        [sessionId]: page.nextCursor,
+      }));
+    } catch (error) {
+      scrollAnchorRef.current = null;
+      setChatError((error as Error).message);
+    } finally {
+      setLoadingEarlier(false);
+    }
+  }, [selectedSessionId, earlierCursor, loadingEarlier]);
+
   React.useEffect(() => {
-    if (!chatContainerRef.current) {
+    const container = chatContainerRef.current;
+    if (!container) {
+      return;
+    }
+
+    const anchor = scrollAnchorRef.current;
+    if (anchor) {
+      scrollAnchorRef.current = null;
+      container.scrollTop =
+        container.scrollHeight - anchor.scrollHeight + anchor.scrollTop;
       return;
     }
-    chatContainerRef.current.scrollTop = chatContainerRef.current.scrollHeight;
+    container.scrollTop = container.scrollHeight;
   }, [selectedSessionId, messages, isThinking]);
 
   const currentSession = React.useMemo(
@@ -1429,6 +1492,19 @@ export default function Dashboard() {
         bg-white dark:bg-zinc-900
       "
             >
+              {earlierCursor && !chatLoading && sessionHasDocuments && (
+                <div className="flex justify-center">
+                  <Button
+                    type="button"
+                    variant="ghost"
+                    size="sm"
+                    disabled={loadingEarlier}
+                    onClick={handleLoadEarlierMessages}
+                  >
+                    {loadingEarlier ? "Loading…" : "Load earlier messages"}
+                  </Button>
+                </div>
+              )}
               {!hasSessions ? (
                 <p className="text-sm text-muted-foreground">
                   Upload your first document to create a session and start
@@ -1578,6 +1654,19 @@ export default function Dashboard() {
         bg-white dark:bg-zinc-900
       "
             >
+              {earlierCursor && !chatLoading && sessionHasDocuments && (
+                <div className="flex justify-center">
+                  <Button
+                    type="button"
+                    variant="ghost"
+                    size="sm"
+                    disabled={loadingEarlier}
+                    onClick={handleLoadEarlierMessages}
+                  >
+                    {loadingEarlier ? "Loading…" : "Load earlier messages"}
+                  </Button>
+                </div>
+              )}
               {!hasSessions ? (
                 <p className="text-sm text-muted-foreground">
                   Upload your first document to create a session and start